@@ -1,19 +1,45 @@
 import cv2
-import numpy as np
 import tkinter as tk
 from PIL import Image, ImageTk
+from componentes import ConnectedComponents, LabelOverlayRenderer
+from geometria import ShapeMetrics
+from medicoes import StreamingAnalyzer
+from cache import image_key
+from histogramas import HistogramEngine, HistogramRenderer, histogram
+from mosaico import tiled_binary_stats
+from pipeline import LatestSlot
+import queue
+import threading
+import time
 
 class Analise:
     def __init__(self, app):
         self.app = app 
+        self.componentes = ConnectedComponents("auto")
+        self.overlay = LabelOverlayRenderer(alpha=0.4)
+        self.last_stats = None
+        self.metricas = ShapeMetrics()
+        self.last_diameter = None
+        self.stream = StreamingAnalyzer(self.app.filtros._binarizar)
+        self._stream_after = None
+        self.hist_engine = HistogramEngine(window=8)
+        self.hist_renderer = HistogramRenderer()
+        self.live_histogram = False
+        self._hist_window = None
+        self._hist_label = None
+        self._hist_photo = None
+        self._hist_results = LatestSlot()
+        self._hist_seq = 0
+        self._hist_thread = None
+        self._hist_reset = False
+        self._hist_after = None
 
     def run_analysis(self):
         source_bgr = None
         if self.app.running:
-            with self.app.lock:
-                source_bgr = self.app.frame.copy() if self.app.frame is not None else None
+            source_bgr = self.app.frame
         else:
-            source_bgr = self.app.image_bgr.copy() if self.app.image_bgr is not None else None
+            source_bgr = self.app.image_bgr
 
         if source_bgr is None:
             tk.messagebox.showinfo("Info", "Nenhuma imagem disponível para análise.")
@@ -22,108 +48,246 @@ class Analise:
         choice = self.app.analysis_var.get()
         self.app.results_text.delete("1.0", tk.END)
 
-        gray = cv2.cvtColor(source_bgr, cv2.COLOR_BGR2GRAY)
-        binary = self.app.filtros._ensure_binary(source_bgr)
+        if self.app.tiled is not None and not self.app.running and choice in self.TILED:
+            self._run_tiled_analysis(choice)
+            return
+
+        # Resultados ficam no cache da aplicação pelo conteúdo da imagem:
+        # repetir a análise na mesma imagem não recalcula nada
+        key = (image_key(source_bgr), self.app.filtros.binarizer.key)
+
+        def cached(kind, compute):
+            return self.app.cache.get_or_compute(("analise", kind, key), compute)
+
+        binary = cached("binario", lambda: self.app.filtros._ensure_binary(source_bgr))
+        def metrics():
+            # Área, perímetro e diâmetro saem da mesma passada de contornos
+            return cached("metricas", lambda: self.metricas.measure(binary))
 
         if choice == "Histograma (Tonais ou Binário)":
             self.app.results_text.insert(tk.END, "Histograma gerado (escala de cinza e binário).\n")
+            gray = cv2.cvtColor(source_bgr, cv2.COLOR_BGR2GRAY)
             self._show_histograms(gray, binary)
 
         elif choice == "Área (pixels brancos)":
-            area = int(np.count_nonzero(binary == 255))
+            area = metrics()["pixel_area"]
             self.app.results_text.insert(tk.END, f"Área (pixels brancos): {area}\n")
 
         elif choice == "Perímetro (contorno)":
-            perimeter = self._compute_perimeter(binary)
-            self.app.results_text.insert(tk.END, f"Perímetro total: {perimeter:.2f}\n")
+            result = metrics()
+            self.app.results_text.insert(tk.END, f"Perímetro total: {result['perimeter']:.2f}\n")
+            for i, o in enumerate(result["objects"][:10], 1):
+                self.app.results_text.insert(
+                    tk.END, f"  Objeto {i}: perímetro={o['perimeter']:.2f} "
+                            f"circularidade={o['circularity']:.3f}\n")
 
         elif choice == "Diâmetro (máx. distância)":
-            diameter = self._compute_diameter(binary)
+            result = metrics()
+            self.last_diameter = result
+            diameter = result["diameter"]
             self.app.results_text.insert(tk.END, f"Diâmetro máximo: {diameter:.2f} px\n")
+            self.app.results_text.insert(tk.END, f"Diâmetro global: {result['global_diameter']:.2f} px\n")
+            for i, (d, _, _) in enumerate(result["per_object"][:10], 1):
+                self.app.results_text.insert(tk.END, f"  Objeto {i}: {d:.2f} px\n")
+            self._show_diameter_overlay(source_bgr, result)
 
         elif choice == "Contagem de objetos (crescimento de região)":
-            count, labeled = self._region_growth_count(binary)
+            count, labeled, self.last_stats = cached("rotulos", lambda: self.componentes.label(binary))
             self.app.results_text.insert(tk.END, f"Objetos encontrados: {count}\n")
-            self._show_label_overlay(source_bgr, labeled)
+            for st in self.last_stats[:10]:
+                self.app.results_text.insert(
+                    tk.END,
+                    f"  #{st['label']}: área={st['area']} bbox=({st['x']}, {st['y']}, {st['w']}, {st['h']}) "
+                    f"centroide=({st['cx']:.1f}, {st['cy']:.1f})\n"
+                )
+            self._show_label_overlay(source_bgr, labeled, self.app.overlay_mode_var.get())
 
         else:
             self.app.results_text.insert(tk.END, "Selecione uma análise válida.\n")
 
-    def _histogram_image(self, img_gray):
-        hist_size = 256
-        hist = cv2.calcHist([img_gray], [0], None, [hist_size], [0, 256]).flatten()
-        hist_norm = hist / (hist.max() if hist.max() > 0 else 1)
-        w, h = 512, 200
-        hist_img = np.full((h, w, 3), 255, dtype=np.uint8)
-        for i in range(hist_size):
-            x = int(i * (w / hist_size))
-            y = int(hist_norm[i] * (h - 20))
-            cv2.line(hist_img, (x, h-1), (x, h-1 - y), (50, 50, 220), 1)
-        cv2.rectangle(hist_img, (0, 0), (w-1, h-1), (0, 0, 0), 1)
-        cv2.putText(hist_img, "Histograma", (10, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,0,0), 1)
-        return hist_img
+    # ---------- Imagem em blocos ----------
+    TILED = ("Área (pixels brancos)", "Contagem de objetos (crescimento de região)")
+
+    def _run_tiled_analysis(self, choice):
+        """Área e contagem na imagem grande inteira, bloco a bloco, fora da thread do Tk.
+
+        O worker só põe o resultado numa fila; a interface é atualizada por
+        `_poll_tiled`, que roda na thread do Tk com `after`.
+        """
+        tiled, binarizer = self.app.tiled, self.app.filtros.binarizer
+        key = ("analise", "blocos", tiled.path, tiled.shape, binarizer.key)
+        self.app.results_text.insert(tk.END, f"Analisando {tiled.megapixels:.0f} MP em blocos...\n")
+        results = queue.Queue()
+
+        def work():
+            try:
+                stats = self.app.cache.get_or_compute(key, lambda: tiled_binary_stats(tiled, binarizer))
+            except Exception as e:
+                results.put(("erro", str(e)))
+                return
+            results.put(("ok", stats))
+
+        threading.Thread(target=work, daemon=True).start()
+        self.app.root.after(100, self._poll_tiled, results, choice, tiled)
+
+    def _poll_tiled(self, results, choice, tiled):
+        try:
+            status, value = results.get_nowait()
+        except queue.Empty:
+            self.app.root.after(100, self._poll_tiled, results, choice, tiled)
+            return
+        text = self.app.results_text
+        text.delete("1.0", tk.END)
+        if status == "erro":
+            text.insert(tk.END, f"Falha na análise em blocos: {value}\n")
+            return
+        if choice == self.TILED[0]:
+            text.insert(tk.END, f"Área (pixels brancos): {value['area']}\n")
+        else:
+            text.insert(tk.END, f"Objetos encontrados: {value['count']}\n")
+        text.insert(tk.END, f"Imagem completa ({tiled.width}x{tiled.height}, {value['tiles']} blocos)\n")
+
+    # ---------- Análise contínua ----------
+    def toggle_streaming(self, enabled):
+        # Um só laço de atualização: o agendado antes é cancelado
+        if self._stream_after is not None:
+            self.app.root.after_cancel(self._stream_after)
+            self._stream_after = None
+        if enabled:
+            self.stream.start()
+            self.app.results_text.delete("1.0", tk.END)
+            self.app.results_text.insert(tk.END, "Análise contínua iniciada.\n")
+            self._stream_after = self.app.root.after(200, self._poll_stream)
+        else:
+            self.stream.stop()
+
+    def _poll_stream(self):
+        if not self.stream.running:
+            self._stream_after = None
+            return
+        m = self.stream.latest()
+        if m is not None:
+            self.app.results_text.delete("1.0", tk.END)
+            self.app.results_text.insert(
+                tk.END,
+                f"Área: {m['area']} px | Perímetro: {m['perimeter']:.2f} | "
+                f"Diâmetro: {m['diameter']:.2f} px | Objetos: {m['count']}\n"
+                f"Latência: {m['latency'] * 1000:.1f} ms | "
+                f"Processados: {self.stream.processed} | Descartados: {self.stream.dropped}\n"
+            )
+        self._stream_after = self.app.root.after(200, self._poll_stream)
 
+    # ---------- Histogramas ----------
     def _show_histograms(self, gray, binary):
-        hist_gray_bgr = self._histogram_image(gray)
-        hist_bin_bgr = self._histogram_image(binary)
-        self._show_image(hist_gray_bgr, "Histograma - Tons de Cinza")
-        self._show_image(hist_bin_bgr, "Histograma - Binário")
-
-    def _compute_perimeter(self, binary):
-        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
-        return sum(cv2.arcLength(c, True) for c in contours)
-
-    def _compute_diameter(self, binary):
-        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        max_d = 0.0
-        for c in contours:
-            hull = cv2.convexHull(c)
-            pts = hull.reshape(-1, 2)
-            for i in range(len(pts)):
-                for j in range(i+1, len(pts)):
-                    d = np.linalg.norm(pts[i] - pts[j])
-                    if d > max_d:
-                        max_d = d
-        return max_d
-
-    def _region_growth_count(self, binary):
-        h, w = binary.shape
-        visited = np.zeros_like(binary, dtype=np.uint8)
-        label_img = np.zeros((h, w), dtype=np.int32)
-        label = 0
-        neighbors = [(-1,-1), (-1,0), (-1,1), (0,-1), (0,1), (1,-1), (1,0), (1,1)]
-
-        for y in range(h):
-            for x in range(w):
-                if binary[y, x] == 255 and visited[y, x] == 0:
-                    label += 1
-                    queue = [(y, x)]
-                    visited[y, x] = 1
-                    label_img[y, x] = label
-                    while queue:
-                        cy, cx = queue.pop(0)
-                        for dy, dx in neighbors:
-                            ny, nx = cy + dy, cx + dx
-                            if 0 <= ny < h and 0 <= nx < w:
-                                if binary[ny, nx] == 255 and visited[ny, nx] == 0:
-                                    visited[ny, nx] = 1
-                                    label_img[ny, nx] = label
-                                    queue.append((ny, nx))
-        return label, label_img
-
-    def _show_label_overlay(self, bgr, labels):
+        img = self.hist_renderer.render({"cinza": histogram(gray), "binario": histogram(binary)})
+        self._show_histogram_window(img, "Histograma - Tons de Cinza e Binário")
+
+    def _show_histogram_window(self, bgr, title):
+        # Uma janela só: reaproveita a PhotoImage enquanto o tamanho não muda
+        pil = Image.fromarray(cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB))
+        if self._hist_window is None or not self._hist_window.winfo_exists():
+            self._hist_window = tk.Toplevel(self.app.root)
+            self._hist_window.protocol("WM_DELETE_WINDOW", self._close_histogram_window)
+            self._hist_label = tk.Label(self._hist_window)
+            self._hist_label.pack()
+            self._hist_photo = None
+        self._hist_window.title(title)
+        if self._hist_photo is not None and \
+                (self._hist_photo.width(), self._hist_photo.height()) == pil.size:
+            self._hist_photo.paste(pil)
+        else:
+            self._hist_photo = ImageTk.PhotoImage(pil)
+            self._hist_label.configure(image=self._hist_photo)
+
+    def _close_histogram_window(self):
+        self.toggle_live_histogram(False)
+        self.app.var_live_histogram.set(False)
+        self._hist_window.destroy()
+        self._hist_window = None
+
+    def toggle_live_histogram(self, enabled):
+        """Liga/desliga o histograma ao vivo.
+
+        Uma thread soma os histogramas (HSV e calcHist fora do Tk), uma vez
+        por quadro novo: na câmera pelo número de sequência, no vídeo e na
+        imagem estática pela identidade do array. O Tk só desenha o último
+        resultado publicado.
+        """
+        self.live_histogram = enabled
+        if not enabled:
+            return
+        self._hist_reset = True
+        if self._hist_thread is None or not self._hist_thread.is_alive():
+            self._hist_thread = threading.Thread(target=self._histogram_loop, daemon=True)
+            self._hist_thread.start()
+        if self._hist_after is None:
+            self._poll_histogram()
+
+    def _histogram_loop(self):
+        camera, seq, last = None, 0, None
+        while self.live_histogram:
+            if self._hist_reset:
+                self._hist_reset = False
+                self.hist_engine.reset()
+                camera, seq, last = None, 0, None
+            app = self.app
+            cam = app.camera if app.running else None
+            if cam is not None:
+                if cam is not camera:
+                    camera, seq = cam, 0
+                item = cam.acquire(seq, timeout=0.1)
+                if item is None:
+                    continue
+                slot, frame, _, seq = item
+                try:
+                    hists = self.hist_engine.update(frame)
+                finally:
+                    cam.release(slot)
+            else:
+                if app.video_running:
+                    with app.lock:
+                        source = app.video_frame
+                else:
+                    source = app.image_bgr
+                if source is None or source is last:
+                    time.sleep(0.03)
+                    continue
+                # Imagem estática só entra uma vez na janela
+                last = source
+                hists = self.hist_engine.update(source)
+            # A sequência não recomeça: o slot ignora sequências já vistas
+            self._hist_seq += 1
+            # As somas continuam mudando nesta thread: o Tk recebe uma cópia
+            self._hist_results.put(self._hist_seq, {c: h.copy() for c, h in hists.items()})
+
+    def _poll_histogram(self):
+        if not self.live_histogram:
+            self._hist_after = None
+            return
+        item = self._hist_results.get(timeout=0)
+        if item is not None:
+            self._show_histogram_window(self.hist_renderer.render(item[2]),
+                                        f"Histograma ao vivo ({self.hist_engine.window} quadros)")
+        self._hist_after = self.app.root.after(33, self._poll_histogram)
+
+    def _show_diameter_overlay(self, bgr, result):
+        if result["endpoints"] is None:
+            return
+        vis = bgr.copy()
+        for _, p, q in result["per_object"]:
+            cv2.line(vis, p, q, (0, 200, 255), 1)
+        p, q = result["global_endpoints"]
+        cv2.line(vis, p, q, (0, 0, 255), 2)
+        cv2.circle(vis, p, 4, (0, 0, 255), -1)
+        cv2.circle(vis, q, 4, (0, 0, 255), -1)
+        self._show_image(vis, "Diâmetro (segmento medido)")
+
+    def _show_label_overlay(self, bgr, labels, mode="fill"):
         max_label = labels.max()
         if max_label <= 0:
             self.app.results_text.insert(tk.END, "Nenhum objeto para visualizar.\n")
             return
-        rng = np.random.default_rng(42)
-        colors = rng.integers(0, 255, size=(max_label+1, 3), dtype=np.uint8)
-        overlay = np.zeros_like(bgr)
-        h, w = labels.shape
-        for y in range(h):
-            for x in range(w):
-                overlay[y, x] = colors[labels[y, x]]
-        blend = cv2.addWeighted(bgr, 0.6, overlay, 0.4, 0.0)
+        blend = self.overlay.render(bgr, labels, mode)
         self._show_image(blend, "Objetos rotulados (overlay)")
 
     def _show_image(self, bgr, title):
@@ -0,0 +1,114 @@
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+_MISSING = object()
+
+
+def _nbytes(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value) + 8 * len(value)
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values()) + 16 * len(value)
+    return 64
+
+
+class ImageKeys:
+    """Hash de conteúdo de imagens, memorizado pela identidade do array.
+
+    O mesmo ndarray (por exemplo a imagem estática reenviada ao pipeline)
+    só é lido uma vez; cópias com o mesmo conteúdo geram a mesma chave.
+    """
+
+    def __init__(self):
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, img):
+        with self._lock:
+            entry = self._memo.get(id(img))
+            if entry is not None and entry[0]() is img:
+                return entry[1]
+        data = np.ascontiguousarray(img)
+        digest = hashlib.blake2b(memoryview(data).cast("B"), digest_size=16).hexdigest()
+        key = (img.shape, img.dtype.str, digest)
+        try:
+            ref = weakref.ref(img, lambda _, i=id(img): self._forget(i))
+        except TypeError:
+            return key
+        with self._lock:
+            self._memo[id(img)] = (ref, key)
+        return key
+
+    def _forget(self, ident):
+        with self._lock:
+            self._memo.pop(ident, None)
+
+
+image_key = ImageKeys()
+
+
+class ResultCache:
+    """Cache LRU de resultados com limite de memória (bytes).
+
+    As chaves combinam a chave da imagem (`image_key`) com o que mais
+    determina o resultado (cadeia de filtros, parâmetros, tipo de análise).
+    Arrays guardados devem ser tratados como somente leitura.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value):
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._items[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.bytes -= evicted
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+    def stats(self):
+        return {"itens": len(self._items), "MB": self.bytes / 2 ** 20,
+                "acertos": self.hits, "faltas": self.misses}
+
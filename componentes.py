@@ -0,0 +1,274 @@
+from collections import deque
+
+import cv2
+import numpy as np
+
+# Estatísticas por objeto (um registro por rótulo, na ordem dos rótulos)
+STATS_DTYPE = np.dtype([
+    ("label", np.int32),
+    ("area", np.int64),
+    ("x", np.int32), ("y", np.int32),
+    ("w", np.int32), ("h", np.int32),
+    ("cx", np.float64), ("cy", np.float64),
+])
+
+
+class ConnectedComponents:
+    """Rotulagem de componentes conexos (vizinhança 8) em imagens binárias.
+
+    Backends: "opencv" (connectedComponentsWithStats), "numpy" (união de
+    corridas por linha, sem laço por pixel) e "bfs" (crescimento de região
+    original, mantido como referência). "auto" escolhe o mais rápido.
+    Os rótulos seguem a ordem de varredura do primeiro pixel de cada objeto,
+    igual ao crescimento de região, qualquer que seja o backend.
+    """
+
+    BACKENDS = ("auto", "opencv", "numpy", "bfs")
+
+    def __init__(self, backend="auto"):
+        self.set_backend(backend)
+
+    def set_backend(self, backend):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Backend desconhecido: {backend}")
+        if backend == "auto":
+            backend = "opencv" if hasattr(cv2, "connectedComponentsWithStats") else "numpy"
+        self.backend = backend
+
+    def label(self, binary):
+        """Retorna (count, label_img, stats) considerando pixels == 255 como objeto."""
+        mask = np.ascontiguousarray(binary == 255)
+        if self.backend == "opencv":
+            return self._label_opencv(mask)
+        if self.backend == "numpy":
+            return self._label_runs(mask)
+        return self._label_bfs(mask)
+
+    # ---------- OpenCV ----------
+    def _label_opencv(self, mask):
+        n, labels, cv_stats, centroids = cv2.connectedComponentsWithStats(
+            mask.view(np.uint8), connectivity=8, ltype=cv2.CV_32S
+        )
+        count = n - 1
+        if count == 0:
+            return 0, labels, np.zeros(0, dtype=STATS_DTYPE)
+
+        # Reordena os rótulos pela posição do primeiro pixel (ordem de varredura).
+        # O primeiro pixel de cada objeto está na linha do topo do seu bbox.
+        tops = cv_stats[1:, cv2.CC_STAT_TOP]
+        rows = np.unique(tops)
+        sub = labels[rows]
+        rr, cc = np.nonzero(sub)
+        lab = sub[rr, cc]
+        keep = rows[rr] == tops[lab - 1]
+        lab, cc = lab[keep], cc[keep]
+        uniq, first = np.unique(lab, return_index=True)
+        first_x = np.empty(count, dtype=np.int64)
+        first_x[uniq - 1] = cc[first]
+        order = np.lexsort((first_x, tops))
+
+        lut = np.zeros(n, dtype=np.int32)
+        lut[order + 1] = np.arange(1, n, dtype=np.int32)
+        labels = lut[labels]
+
+        src = order + 1
+        stats = np.empty(count, dtype=STATS_DTYPE)
+        stats["label"] = np.arange(1, n)
+        stats["area"] = cv_stats[src, cv2.CC_STAT_AREA]
+        stats["x"] = cv_stats[src, cv2.CC_STAT_LEFT]
+        stats["y"] = cv_stats[src, cv2.CC_STAT_TOP]
+        stats["w"] = cv_stats[src, cv2.CC_STAT_WIDTH]
+        stats["h"] = cv_stats[src, cv2.CC_STAT_HEIGHT]
+        stats["cx"] = centroids[src, 0]
+        stats["cy"] = centroids[src, 1]
+        return count, labels, stats
+
+    # ---------- NumPy (corridas + união) ----------
+    def _label_runs(self, mask):
+        h, w = mask.shape
+        label_img = np.zeros((h, w), dtype=np.int32)
+
+        # Corridas horizontais de pixels brancos: [start, end) em cada linha
+        padded = np.zeros((h, w + 2), dtype=np.int8)
+        padded[:, 1:-1] = mask
+        d = np.diff(padded, axis=1)
+        run_row, run_start = np.nonzero(d == 1)
+        _, run_end = np.nonzero(d == -1)
+        n_runs = run_row.size
+        if n_runs == 0:
+            return 0, label_img, np.zeros(0, dtype=STATS_DTYPE)
+
+        # Pares de corridas 8-conectadas entre linhas consecutivas.
+        # Chaves (linha, coluna) linearizadas mantêm as corridas ordenadas.
+        stride = w + 2
+        start_key = run_row * stride + run_start
+        end_key = run_row * stride + run_end
+        prev_row = (run_row - 1) * stride
+        lo = np.searchsorted(end_key, prev_row + run_start, side="left")
+        hi = np.searchsorted(start_key, prev_row + run_end, side="right")
+        counts = np.maximum(hi - lo, 0)
+        a = np.repeat(np.arange(n_runs), counts)
+        offsets = np.arange(a.size) - np.repeat(np.cumsum(counts) - counts, counts)
+        b = np.repeat(lo, counts) + offsets
+
+        # Propagação do menor índice + salto de ponteiros até estabilizar
+        parent = np.arange(n_runs)
+        while a.size:
+            m = np.minimum(parent[a], parent[b])
+            before = parent.copy()
+            np.minimum.at(parent, a, m)
+            np.minimum.at(parent, b, m)
+            while True:
+                jumped = parent[parent]
+                if np.array_equal(jumped, parent):
+                    break
+                parent = jumped
+            if np.array_equal(before, parent):
+                break
+
+        # A raiz é a primeira corrida do objeto: ordenar raízes = ordem de varredura
+        _, run_label = np.unique(parent, return_inverse=True)
+        run_label = run_label.astype(np.int32) + 1
+        count = int(run_label.max())
+
+        lengths = run_end - run_start
+        flat_start = run_row * w + run_start
+        base = np.repeat(flat_start - (np.cumsum(lengths) - lengths), lengths)
+        label_img.ravel()[base + np.arange(base.size)] = np.repeat(run_label, lengths)
+
+        idx = run_label - 1
+        area = np.bincount(idx, weights=lengths, minlength=count)
+        sum_x = np.bincount(idx, weights=lengths * (run_start + run_end - 1) / 2.0, minlength=count)
+        sum_y = np.bincount(idx, weights=lengths * run_row, minlength=count)
+        x0 = np.full(count, w, dtype=np.int64)
+        y0 = np.full(count, h, dtype=np.int64)
+        x1 = np.zeros(count, dtype=np.int64)
+        y1 = np.zeros(count, dtype=np.int64)
+        np.minimum.at(x0, idx, run_start)
+        np.minimum.at(y0, idx, run_row)
+        np.maximum.at(x1, idx, run_end)
+        np.maximum.at(y1, idx, run_row + 1)
+
+        stats = np.empty(count, dtype=STATS_DTYPE)
+        stats["label"] = np.arange(1, count + 1)
+        stats["area"] = area
+        stats["x"], stats["y"] = x0, y0
+        stats["w"], stats["h"] = x1 - x0, y1 - y0
+        stats["cx"] = sum_x / area
+        stats["cy"] = sum_y / area
+        return count, label_img, stats
+
+    # ---------- Crescimento de região (referência) ----------
+    def _label_bfs(self, mask):
+        h, w = mask.shape
+        visited = np.zeros((h, w), dtype=np.uint8)
+        label_img = np.zeros((h, w), dtype=np.int32)
+        label = 0
+        neighbors = [(-1,-1), (-1,0), (-1,1), (0,-1), (0,1), (1,-1), (1,0), (1,1)]
+
+        for y in range(h):
+            for x in range(w):
+                if mask[y, x] and visited[y, x] == 0:
+                    label += 1
+                    queue = deque([(y, x)])
+                    visited[y, x] = 1
+                    label_img[y, x] = label
+                    while queue:
+                        cy, cx = queue.popleft()
+                        for dy, dx in neighbors:
+                            ny, nx = cy + dy, cx + dx
+                            if 0 <= ny < h and 0 <= nx < w:
+                                if mask[ny, nx] and visited[ny, nx] == 0:
+                                    visited[ny, nx] = 1
+                                    label_img[ny, nx] = label
+                                    queue.append((ny, nx))
+        return label, label_img, self.stats_from_labels(label_img, label)
+
+    @staticmethod
+    def stats_from_labels(label_img, count):
+        """Calcula área, bbox e centroide a partir de uma imagem de rótulos."""
+        stats = np.zeros(count, dtype=STATS_DTYPE)
+        stats["label"] = np.arange(1, count + 1)
+        if count == 0:
+            return stats
+        ys, xs = np.nonzero(label_img)
+        idx = label_img[ys, xs] - 1
+        area = np.bincount(idx, minlength=count)
+        x0 = np.full(count, label_img.shape[1], dtype=np.int64)
+        y0 = np.full(count, label_img.shape[0], dtype=np.int64)
+        x1 = np.zeros(count, dtype=np.int64)
+        y1 = np.zeros(count, dtype=np.int64)
+        np.minimum.at(x0, idx, xs)
+        np.minimum.at(y0, idx, ys)
+        np.maximum.at(x1, idx, xs + 1)
+        np.maximum.at(y1, idx, ys + 1)
+        stats["area"] = area
+        stats["x"], stats["y"] = x0, y0
+        stats["w"], stats["h"] = x1 - x0, y1 - y0
+        stats["cx"] = np.bincount(idx, weights=xs, minlength=count) / area
+        stats["cy"] = np.bincount(idx, weights=ys, minlength=count) / area
+        return stats
+
+
+class LabelOverlayRenderer:
+    """Colore imagens de rótulos com uma única indexação na paleta.
+
+    A paleta é gerada uma vez e estendida sob demanda, então cada rótulo
+    mantém a mesma cor entre chamadas (e entre quadros). O fundo (rótulo 0)
+    é preto. Modo "fill" pinta o objeto inteiro; "outline" só o contorno.
+    """
+
+    MODES = ("fill", "outline")
+
+    def __init__(self, alpha=0.4, seed=42):
+        self.alpha = alpha
+        self._rng = np.random.default_rng(seed)
+        self._palette = np.zeros((1, 3), dtype=np.uint8)
+        self._overlay = None
+        self._out = None
+
+    def palette(self, max_label):
+        n = int(max_label) + 1
+        if n > len(self._palette):
+            grow = max(n, 2 * len(self._palette)) - len(self._palette)
+            extra = self._rng.integers(0, 255, size=(grow, 3), dtype=np.uint8)
+            self._palette = np.concatenate([self._palette, extra])
+        return self._palette
+
+    def colorize(self, labels):
+        """Imagem BGR com a cor de cada rótulo (uma indexação para o quadro inteiro)."""
+        palette = self.palette(labels.max() if labels.size else 0)
+        if self._overlay is None or self._overlay.shape[:2] != labels.shape:
+            self._overlay = np.empty(labels.shape + (3,), dtype=np.uint8)
+        np.take(palette, labels, axis=0, out=self._overlay)
+        return self._overlay
+
+    @staticmethod
+    def boundaries(labels):
+        """Máscara dos pixels de objeto que têm vizinho (4) com outro rótulo."""
+        edge = np.zeros(labels.shape, dtype=bool)
+        diff_x = labels[:, 1:] != labels[:, :-1]
+        diff_y = labels[1:, :] != labels[:-1, :]
+        edge[:, 1:] |= diff_x
+        edge[:, :-1] |= diff_x
+        edge[1:, :] |= diff_y
+        edge[:-1, :] |= diff_y
+        edge &= labels > 0
+        return edge
+
+    def render(self, bgr, labels, mode="fill"):
+        if mode not in self.MODES:
+            raise ValueError(f"Modo de overlay desconhecido: {mode}")
+        if self._out is None or self._out.shape != bgr.shape:
+            self._out = np.empty_like(bgr)
+
+        if mode == "outline":
+            edge = self.boundaries(labels)
+            palette = self.palette(labels.max() if labels.size else 0)
+            np.copyto(self._out, bgr)
+            self._out[edge] = palette[labels[edge]]
+            return self._out
+
+        overlay = self.colorize(labels)
+        cv2.addWeighted(bgr, 1.0 - self.alpha, overlay, self.alpha, 0.0, dst=self._out)
+        return self._out
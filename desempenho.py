@@ -0,0 +1,281 @@
+"""Benchmark dos filtros, detectores e análises, sem interface gráfica.
+
+Exemplos:
+    python desempenho.py                              # todas as resoluções, quadros sintéticos
+    python desempenho.py -r VGA 1080p -g filtros -o antes.json
+    python desempenho.py --video gravacao.mp4 -o depois.json --compare antes.json
+
+Cada caso roda `--warmup` vezes sem medir e depois `--repeat` vezes
+(limitado a `--max-seconds`), alternando entre alguns quadros. A memória
+de pico vem de uma execução extra sob tracemalloc, que enxerga as
+alocações do numpy mas não as internas do OpenCV.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from componentes import ConnectedComponents
+from filtros import FilterPipeline, filtros
+from geometria import ShapeMetrics
+from medicoes import Measurer
+from quadro import Frame
+from video import VideoProcessor
+
+RESOLUTIONS = {
+    "VGA": (640, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4K": (3840, 2160),
+}
+GROUPS = ("filtros", "detectores", "analises")
+
+
+def synthetic_frames(size, count=8, seed=0):
+    """Quadros com fundo texturizado, uma garrafa roxa em movimento e manchas escuras."""
+    w, h = size
+    rng = np.random.default_rng(seed)
+    base = np.empty((h, w, 3), np.uint8)
+    base[:] = np.linspace(90, 200, w, dtype=np.uint8)[None, :, None]
+    base = cv2.add(base, rng.integers(0, 30, (h, w, 3), dtype=np.uint8))
+    s = min(w, h)
+    for _ in range(12):
+        center = (int(rng.integers(0, w)), int(rng.integers(0, h)))
+        cv2.circle(base, center, int(rng.integers(s // 60, s // 15)), (30, 30, 30), -1)
+    # Padrão xadrez que serve de template
+    tile = max(4, s // 48)
+    patch = np.kron((np.indices((4, 4)).sum(axis=0) % 2) * 255,
+                    np.ones((tile, tile))).astype(np.uint8)
+    px, py = w // 8, h // 8
+    base[py:py + patch.shape[0], px:px + patch.shape[1]] = patch[..., None]
+
+    bw, bh = max(12, s // 10), max(30, s // 4)
+    frames = []
+    for i in range(count):
+        img = base.copy()
+        x = w // 2 + int((i - count / 2) * s / 80)
+        y = h // 2 - bh // 2
+        cv2.rectangle(img, (x, y), (x + bw, y + bh), (170, 40, 140), -1)
+        frames.append(img)
+    template = base[py:py + patch.shape[0], px:px + patch.shape[1]].copy()
+    return frames, template, (w // 2, h // 2 - bh // 2, bw, bh)
+
+
+def recorded_frames(path, size, count=8):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Não foi possível abrir o vídeo: {path}")
+    frames = []
+    try:
+        while len(frames) < count:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(cv2.resize(frame, size, interpolation=cv2.INTER_AREA))
+    finally:
+        cap.release()
+    if not frames:
+        raise RuntimeError(f"Vídeo sem quadros: {path}")
+    return frames
+
+
+def measure(func, frames, warmup=3, repeat=30, max_seconds=5.0):
+    """Retorna latências (ms) de `func(quadro)` e o pico de memória (MB)."""
+    n = len(frames)
+    for i in range(warmup):
+        func(frames[i % n])
+    times = []
+    deadline = time.perf_counter() + max_seconds
+    for i in range(repeat):
+        start = time.perf_counter()
+        func(frames[i % n])
+        times.append((time.perf_counter() - start) * 1000)
+        if time.perf_counter() > deadline:
+            break
+    tracemalloc.start()
+    try:
+        func(frames[0])
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return times, peak / 2 ** 20
+
+
+def summarize(times):
+    arr = np.asarray(times)
+    median = float(np.median(arr))
+    return {
+        "median_ms": median,
+        "p95_ms": float(np.percentile(arr, 95)),
+        "fps": 1000.0 / median if median > 0 else float("inf"),
+        "runs": len(times),
+    }
+
+
+def filter_cases():
+    f = filtros()
+    for name in FilterPipeline.FILTERS:
+        # Cada caso fica com a sua cadeia compilada (e os seus buffers)
+        yield name, f.set_chain([name]).run_native
+
+
+def detector_cases(template_path, bbox):
+    vp = VideoProcessor(audio=False)
+    # Só a detecção: detect_purple_bottle pula quadros enquanto o tracker segue o objeto
+    yield "detect_purple_bottle", lambda bgr: vp._find_purple_bottles(Frame(bgr))
+
+    vpt = VideoProcessor(audio=False)
+    vpt.load_template(template_path)
+    yield "detect_template", lambda bgr: vpt.detect_template(Frame(bgr))
+
+    vpr = VideoProcessor(audio=False)
+    state = {"ready": False}
+
+    def track(bgr):
+        if not state["ready"]:
+            state["ready"] = vpr.init_tracker(bgr, bbox)
+        vpr.update_tracker(Frame(bgr))
+    yield "update_tracker", track
+
+
+def analysis_cases():
+    f = filtros()
+    components = ConnectedComponents("auto")
+    metrics = ShapeMetrics()
+    measurer = Measurer()
+
+    def binary(bgr):
+        return f._binarizar(cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY))
+
+    yield "histograma", lambda bgr: cv2.calcHist([cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)],
+                                                 [0], None, [256], [0, 256])
+    yield "area", lambda bgr: cv2.countNonZero(binary(bgr))
+    # perímetro, diâmetro e demais métricas vêm da mesma passada
+    yield "metricas", lambda bgr: metrics.measure(binary(bgr))
+    yield "contagem", lambda bgr: components.label(binary(bgr))
+    yield "medicoes", lambda bgr: measurer.measure(binary(bgr))
+
+
+def run(resolutions, groups, video=None, warmup=3, repeat=30, max_seconds=5.0, log=print):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for res in resolutions:
+            size = RESOLUTIONS[res]
+            frames, template, bbox = synthetic_frames(size)
+            sources = [("sintetico", frames)]
+            if video:
+                sources.append((os.path.basename(video), recorded_frames(video, size)))
+            template_path = os.path.join(tmp, f"template_{res}.png")
+            cv2.imwrite(template_path, template)
+
+            for source, src_frames in sources:
+                cases = []
+                if "filtros" in groups:
+                    cases += [("filtros",) + c for c in filter_cases()]
+                if "detectores" in groups:
+                    cases += [("detectores",) + c for c in detector_cases(template_path, bbox)]
+                if "analises" in groups:
+                    cases += [("analises",) + c for c in analysis_cases()]
+                for group, name, func in cases:
+                    try:
+                        times, peak = measure(func, src_frames, warmup, repeat, max_seconds)
+                    except Exception as e:
+                        log(f"  {res:>5} {group}/{name}: erro ({e})")
+                        continue
+                    row = dict({"group": group, "name": name, "resolution": res,
+                                "source": source, "peak_mb": peak}, **summarize(times))
+                    results.append(row)
+                    log(f"  {res:>5} {source:<10} {group + '/' + name:<38} "
+                        f"mediana {row['median_ms']:8.2f} ms  p95 {row['p95_ms']:8.2f} ms  "
+                        f"{row['fps']:8.1f} q/s  pico {peak:6.1f} MB")
+    return results
+
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+                                timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def _case_key(row):
+    return row["group"], row["name"], row["resolution"], row["source"]
+
+
+def compare(baseline, results, threshold=1.10, log=print):
+    """Mostra a razão das medianas contra um JSON anterior; retorna as regressões."""
+    old = {_case_key(r): r for r in baseline["results"]}
+    regressions = []
+    for row in results:
+        ref = old.get(_case_key(row))
+        if ref is None or ref["median_ms"] <= 0:
+            continue
+        ratio = row["median_ms"] / ref["median_ms"]
+        if ratio > threshold:
+            regressions.append((row, ratio))
+        log(f"  {row['resolution']:>5} {row['group'] + '/' + row['name']:<38} "
+            f"{ref['median_ms']:8.2f} → {row['median_ms']:8.2f} ms  ({ratio:5.2f}x)"
+            + ("  REGRESSÃO" if ratio > threshold else ""))
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark de filtros, detectores e análises (sem interface).")
+    parser.add_argument("-r", "--resolutions", nargs="+", choices=list(RESOLUTIONS),
+                        default=list(RESOLUTIONS), help="resoluções a medir")
+    parser.add_argument("-g", "--groups", nargs="+", choices=GROUPS, default=list(GROUPS),
+                        help="grupos de operações")
+    parser.add_argument("--video", help="vídeo gravado usado além dos quadros sintéticos")
+    parser.add_argument("--warmup", type=int, default=3, help="execuções descartadas por caso")
+    parser.add_argument("--repeat", type=int, default=30, help="execuções medidas por caso")
+    parser.add_argument("--max-seconds", type=float, default=5.0, help="tempo máximo por caso")
+    parser.add_argument("-o", "--output", help="salva os resultados em JSON")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=1.10,
+                        help="razão de mediana acima da qual o caso é regressão")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        results = run(args.resolutions, args.groups, args.video,
+                      args.warmup, args.repeat, args.max_seconds)
+    except RuntimeError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    report = {"meta": metadata(), "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+        print(f"Resultados salvos em {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        print(f"Comparação com {args.compare} ({baseline['meta'].get('commit')}):")
+        if compare(baseline, results, args.threshold):
+            return 3
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import tkinter as tk
+
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+
+class CanvasDisplay:
+    """Desenha quadros RGB num tk.Canvas sem realocar nada por quadro.
+
+    Escala e deslocamentos só são recalculados quando o canvas muda de
+    tamanho (evento <Configure>) ou chega um quadro de outra resolução.
+    O redimensionamento escreve num buffer preparado uma vez e a
+    PhotoImage existente é atualizada com `paste`; sem quadro novo e sem
+    mudança de tamanho, `show(None)` não faz nada.
+    """
+
+    def __init__(self, canvas, placeholder="Carregue uma imagem ou inicie a câmera"):
+        self.canvas = canvas
+        self.placeholder = placeholder
+        self.canvas_size = (canvas.winfo_width(), canvas.winfo_height())
+        self.scale = None
+        self.offset = (0, 0)
+        self._image_shape = None
+        self._buffer = None
+        self._photo = None
+        self._item = None
+        self._text_item = None
+        self._last = None
+        self._dirty = False
+        self.redraws = 0
+        canvas.bind("<Configure>", self._on_configure, add="+")
+
+    def _on_configure(self, event):
+        size = (event.width, event.height)
+        if size != self.canvas_size:
+            self.canvas_size = size
+            self._image_shape = None
+            self._dirty = True
+
+    def _layout(self, shape):
+        h, w = shape[:2]
+        cw, ch = self.canvas_size
+        if cw <= 1 or ch <= 1:
+            return False
+        self.scale = min(cw / w, ch / h)
+        nw, nh = max(1, int(w * self.scale)), max(1, int(h * self.scale))
+        self.offset = ((cw - nw) // 2, (ch - nh) // 2)
+        self._interpolation = cv2.INTER_AREA if self.scale < 1 else cv2.INTER_LINEAR
+        self._buffer = np.empty((nh, nw, 3), dtype=np.uint8)
+        self._photo = ImageTk.PhotoImage("RGB", (nw, nh))
+        if self._item is None:
+            self._item = self.canvas.create_image(cw // 2, ch // 2, image=self._photo, anchor=tk.CENTER)
+        else:
+            self.canvas.coords(self._item, cw // 2, ch // 2)
+            self.canvas.itemconfig(self._item, image=self._photo)
+        self._image_shape = shape
+        return True
+
+    def show(self, rgb):
+        """Desenha `rgb` (ou redesenha o último quadro se o canvas mudou)."""
+        if rgb is None:
+            if not self._dirty or self._last is None:
+                return False
+            rgb = self._last
+        self._dirty = False
+        if self._text_item is not None:
+            self.canvas.delete(self._text_item)
+            self._text_item = None
+        if rgb.shape != self._image_shape and not self._layout(rgb.shape):
+            # Canvas ainda sem tamanho: tenta de novo no próximo <Configure>
+            self._last = rgb
+            self._dirty = True
+            return False
+        if self._buffer.shape == rgb.shape:
+            np.copyto(self._buffer, rgb)
+        else:
+            cv2.resize(rgb, self._buffer.shape[1::-1], dst=self._buffer,
+                       interpolation=self._interpolation)
+        self._photo.paste(Image.fromarray(self._buffer))
+        self._last = rgb
+        self.redraws += 1
+        return True
+
+    def clear(self):
+        """Remove o quadro e mostra o texto de espera (uma vez só)."""
+        if self._text_item is not None and not self._dirty:
+            return
+        self._last = None
+        self._dirty = False
+        if self._item is not None:
+            self.canvas.delete(self._item)
+            self._item = None
+            self._image_shape = None
+        cw, ch = self.canvas_size
+        if self._text_item is None:
+            self._text_item = self.canvas.create_text((cw or 400) // 2, (ch or 300) // 2,
+                                                      text=self.placeholder, fill="#ddd")
+        else:
+            self.canvas.coords(self._text_item, (cw or 400) // 2, (ch or 300) // 2)
+
+    def to_image(self, x, y):
+        """Converte coordenadas do canvas para pixels do quadro exibido."""
+        if self.scale is None or self._image_shape is None:
+            return None
+        h, w = self._image_shape[:2]
+        ix = int((x - self.offset[0]) / self.scale)
+        iy = int((y - self.offset[1]) / self.scale)
+        return max(0, min(ix, w)), max(0, min(iy, h))
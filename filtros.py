@@ -1,16 +1,93 @@
+import threading
+
 import cv2 as cv
 import numpy as np
+from quadro import Frame
+
+
+class Binarizer:
+    """Binarização do cinza em um dos modos suportados.
+
+    - "fixo": limiar `threshold`;
+    - "otsu": limiar escolhido pelo histograma;
+    - "media" / "gaussiano": limiar adaptativo local (janela `block_size`,
+      constante `C`).
+
+    `key` identifica a configuração (usada nos caches por quadro) e
+    `apply` aceita um buffer de saída para reaproveitamento.
+    """
+
+    MODES = ("fixo", "otsu", "media", "gaussiano")
+
+    def __init__(self, mode="fixo", threshold=127, block_size=31, C=5):
+        if mode not in self.MODES:
+            raise ValueError(f"Binarização desconhecida: {mode}")
+        if block_size < 3 or block_size % 2 == 0:
+            raise ValueError("block_size deve ser ímpar e >= 3")
+        self.mode = mode
+        self.threshold = threshold
+        self.block_size = block_size
+        self.C = C
+        if mode == "fixo":
+            self.key = (mode, threshold)
+        elif mode == "otsu":
+            self.key = (mode,)
+        else:
+            self.key = (mode, block_size, C)
+
+    def apply(self, gray, dst=None):
+        if self.mode == "fixo":
+            return cv.threshold(gray, self.threshold, 255, cv.THRESH_BINARY, dst=dst)[1]
+        if self.mode == "otsu":
+            return cv.threshold(gray, 0, 255, cv.THRESH_BINARY + cv.THRESH_OTSU, dst=dst)[1]
+        method = cv.ADAPTIVE_THRESH_MEAN_C if self.mode == "media" else cv.ADAPTIVE_THRESH_GAUSSIAN_C
+        return cv.adaptiveThreshold(gray, 255, method, cv.THRESH_BINARY,
+                                    self.block_size, self.C, dst=dst)
+
 
 class filtros:
+    def __init__(self):
+        self._chain_key = None
+        self.binarizer = Binarizer()
+        self._local = threading.local()
+        self.set_chain([])
+
     def _to_gray(self, img):
         if len(img.shape) == 3:
             return cv.cvtColor(img, cv.COLOR_BGR2GRAY)
         return img
 
+    def _scratch(self, name, shape):
+        # Buffers por thread: o worker de análise contínua e a interface não disputam
+        buf = getattr(self._local, name, None)
+        if buf is None or buf.shape != shape:
+            buf = np.empty(shape, np.uint8)
+            setattr(self._local, name, buf)
+        return buf
+
     def _binarizar(self, img):
-        gray = self._to_gray(img)
-        _, binary = cv.threshold(gray, 127, 255, cv.THRESH_BINARY)
-        return binary
+        """Binariza em buffers reaproveitados (válido até a próxima chamada na thread)."""
+        if img.ndim == 3:
+            img = cv.cvtColor(img, cv.COLOR_BGR2GRAY, dst=self._scratch("gray", img.shape[:2]))
+        return self.binarizer.apply(img, dst=self._scratch("binary", img.shape))
+
+    def _ensure_binary(self, img, kind=None):
+        """Binário de um Frame ou ndarray com o binarizador atual.
+
+        Com Frame, o cinza e o binário ficam guardados no próprio quadro e
+        são compartilhados por quem pedir depois; `kind="binary"` (saída de
+        uma cadeia que já binariza) devolve a imagem como está.
+        """
+        f = img if isinstance(img, Frame) else Frame(img)
+        if kind == "binary":
+            return f.gray
+        return f.binary(self.binarizer)
+
+    def set_binarization(self, mode, **params):
+        """Troca o binarizador e recompila a cadeia (a morfologia usa o mesmo)."""
+        self.binarizer = Binarizer(mode, **params)
+        names, params = self._chain_key[0], dict(self._chain_key[1])
+        return self.set_chain(names, params)
 
     def _get_kernel(self, tipo='RECT', tamanho=5):
         if tipo == 'RECT':
@@ -22,76 +99,185 @@ class filtros:
         else:
             return np.ones((tamanho, tamanho), np.uint8)
 
+    def set_chain(self, names, params=None):
+        """Compila a cadeia de filtros; chamado só quando a seleção muda."""
+        names = tuple(n for n in names if n and n != "Nenhum")
+        key = (names, tuple(sorted((params or {}).items())), self.binarizer.key)
+        if key != self._chain_key:
+            self.pipeline = FilterPipeline(names, params, kernels=self._get_kernel,
+                                           binarizer=self.binarizer)
+            self._chain_key = key
+        return self.pipeline
+
     def _apply_filters(self, app, bgr):
-        """Aplica o filtro escolhido pelo usuário."""
-        choice = app.effect_var.get()
-        img = bgr.copy()
-
-        # Nenhum filtro
-        if choice == "Nenhum":
-            return cv.cvtColor(img, cv.COLOR_BGR2RGB)
-
-        # Conversão para cinza
-        elif choice == "Cinza":
-            gray = self._to_gray(img)
-            return cv.cvtColor(gray, cv.COLOR_GRAY2RGB)
-
-        # Negativo
-        elif choice == "Negativo":
-            neg = 255 - img
-            return cv.cvtColor(neg, cv.COLOR_BGR2RGB)
-
-        # Binarização Otsu
-        elif choice == "Otsu":
-            gray = self._to_gray(img)
-            _, binary = cv.threshold(gray, 0, 255, cv.THRESH_BINARY + cv.THRESH_OTSU)
-            return cv.cvtColor(binary, cv.COLOR_GRAY2RGB)
-
-        # Erosão
-        elif choice == "Erosão":
-            binary = self._binarizar(img)
-            kernel = self._get_kernel('RECT', 5)
-            eroded = cv.erode(binary, kernel)
-            return cv.cvtColor(eroded, cv.COLOR_GRAY2RGB)
-
-        # Dilatação
-        elif choice == "Dilatação":
-            binary = self._binarizar(img)
-            kernel = self._get_kernel('RECT', 5)
-            dilated = cv.dilate(binary, kernel)
-            return cv.cvtColor(dilated, cv.COLOR_GRAY2RGB)
-
-        # Abertura
-        elif choice == "Abertura":
-            binary = self._binarizar(img)
-            kernel = self._get_kernel('ELLIPSE', 5)
-            eroded = cv.erode(binary, kernel)
-            opened = cv.dilate(eroded, kernel)
-            return cv.cvtColor(opened, cv.COLOR_GRAY2RGB)
-
-        # Fechamento
-        elif choice == "Fechamento":
-            binary = self._binarizar(img)
-            kernel = self._get_kernel('ELLIPSE', 5)
-            dilated = cv.dilate(binary, kernel)
-            closed = cv.erode(dilated, kernel)
-            return cv.cvtColor(closed, cv.COLOR_GRAY2RGB)
-
-        # Detector de Bordas (Canny)
-        elif choice == "Detector de Bordas (Canny)":
-            gray = self._to_gray(img)
-            edges = cv.Canny(gray, 100, 200)
-            return cv.cvtColor(edges, cv.COLOR_GRAY2RGB)
-
-        # Suavização média
-        elif choice == "Suavização (Média)":
-            blur = cv.blur(img, (5, 5))
-            return cv.cvtColor(blur, cv.COLOR_BGR2RGB)
-
-        # Suavização mediana
-        elif choice == "Suavização (Mediana)":
-            blur = cv.medianBlur(img, 5)
-            return cv.cvtColor(blur, cv.COLOR_BGR2RGB)
-
-        # Fallback
-        return cv.cvtColor(img, cv.COLOR_BGR2RGB)
+        """Aplica a cadeia de filtros compilada (retorna RGB)."""
+        return self.pipeline.run(bgr)
+
+    def _filter_frame(self, bgr):
+        """Aplica a cadeia e devolve um Frame, sem conversão para RGB."""
+        return Frame(self.pipeline.run_native(bgr))
+
+
+class FilterPipeline:
+    """Cadeia de filtros compilada uma única vez.
+
+    Cada nome é resolvido no registro `FILTERS` para um passo já com kernel
+    e parâmetros fixos. Os passos escrevem em buffers próprios, reaproveitados
+    entre quadros, e o quadro de entrada nunca é alterado. O tipo da imagem
+    ("bgr", "gray" ou "binary") é acompanhado na compilação, de modo que a
+    morfologia só binariza quando a entrada ainda não é binária, com o
+    `binarizer` recebido (o mesmo das análises).
+    """
+
+    FILTERS = {}
+
+    DEFAULTS = {
+        "threshold": 127,
+        "blur_ksize": 5,
+        "median_ksize": 5,
+        "canny_low": 100,
+        "canny_high": 200,
+        "kernel_size": 5,
+        "otsu_threshold": None,   # fixa o limiar do Otsu (processamento em blocos)
+    }
+
+    @classmethod
+    def register(cls, name):
+        def deco(builder):
+            cls.FILTERS[name] = builder
+            return builder
+        return deco
+
+    def __init__(self, names=(), params=None, kernels=None, binarizer=None):
+        self.names = tuple(names)
+        self.params = dict(self.DEFAULTS, **(params or {}))
+        self.binarizer = binarizer or Binarizer("fixo", self.params["threshold"])
+        self._kernels = kernels
+        self._kernel_cache = {}
+        self._buffers = {}
+        self.steps = []
+        kind = "bgr"
+        for name in self.names:
+            if name not in self.FILTERS:
+                raise ValueError(f"Filtro desconhecido: {name}")
+            for step, kind in self.FILTERS[name](self, kind):
+                self.steps.append(step)
+        self.output_kind = kind
+
+    def kernel(self, tipo, tamanho):
+        key = (tipo, tamanho)
+        if key not in self._kernel_cache:
+            self._kernel_cache[key] = self._kernels(tipo, tamanho)
+        return self._kernel_cache[key]
+
+    def buffer(self, key, shape, dtype=np.uint8):
+        buf = self._buffers.get(key)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            self._buffers[key] = buf
+        return buf
+
+    def run_native(self, bgr):
+        """Saída no tipo nativo do último passo (BGR ou cinza), sem cópia.
+
+        O array retornado pode ser um buffer interno, reescrito no próximo quadro.
+        """
+        img = bgr
+        for step in self.steps:
+            img = step(img)
+        return img
+
+    def run(self, bgr):
+        img = self.run_native(bgr)
+        code = cv.COLOR_GRAY2RGB if img.ndim == 2 else cv.COLOR_BGR2RGB
+        return cv.cvtColor(img, code)
+
+    # ---------- Construtores de passos ----------
+    def to_gray_step(self, kind):
+        if kind != "bgr":
+            return []
+        key = ("gray", len(self.steps))
+        return [(lambda img: cv.cvtColor(img, cv.COLOR_BGR2GRAY,
+                                         dst=self.buffer(key, img.shape[:2])), "gray")]
+
+    def binary_steps(self, kind):
+        if kind == "binary":
+            return []
+        steps = self.to_gray_step(kind)
+        key = ("bin", len(self.steps) + len(steps))
+        b = self.binarizer
+        steps.append((lambda img: b.apply(img, dst=self.buffer(key, img.shape)), "binary"))
+        return steps
+
+    def morph_steps(self, kind, op, tipo):
+        steps = self.binary_steps(kind)
+        key = ("morph", len(self.steps) + len(steps))
+        k = self.kernel(tipo, self.params["kernel_size"])
+        steps.append((lambda img: cv.morphologyEx(img, op, k,
+                                                  dst=self.buffer(key, img.shape)), "binary"))
+        return steps
+
+
+@FilterPipeline.register("Cinza")
+def _build_gray(p, kind):
+    return p.to_gray_step(kind)
+
+
+@FilterPipeline.register("Negativo")
+def _build_negative(p, kind):
+    key = ("neg", len(p.steps))
+    return [(lambda img: cv.bitwise_not(img, dst=p.buffer(key, img.shape)), kind)]
+
+
+@FilterPipeline.register("Otsu")
+def _build_otsu(p, kind):
+    steps = p.to_gray_step(kind)
+    key = ("otsu", len(p.steps) + len(steps))
+    t = p.params["otsu_threshold"]
+    otsu = Binarizer("otsu") if t is None else Binarizer("fixo", t)
+    steps.append((lambda img: otsu.apply(img, dst=p.buffer(key, img.shape)), "binary"))
+    return steps
+
+
+@FilterPipeline.register("Suavização (Média)")
+def _build_blur(p, kind):
+    key = ("blur", len(p.steps))
+    k = p.params["blur_ksize"]
+    out = "gray" if kind == "binary" else kind
+    return [(lambda img: cv.blur(img, (k, k), dst=p.buffer(key, img.shape)), out)]
+
+
+@FilterPipeline.register("Suavização (Mediana)")
+def _build_median(p, kind):
+    key = ("median", len(p.steps))
+    k = p.params["median_ksize"]
+    return [(lambda img: cv.medianBlur(img, k, dst=p.buffer(key, img.shape)), kind)]
+
+
+@FilterPipeline.register("Detector de Bordas (Canny)")
+def _build_canny(p, kind):
+    steps = p.to_gray_step(kind)
+    key = ("canny", len(p.steps) + len(steps))
+    lo, hi = p.params["canny_low"], p.params["canny_high"]
+    steps.append((lambda img: cv.Canny(img, lo, hi, edges=p.buffer(key, img.shape)), "binary"))
+    return steps
+
+
+@FilterPipeline.register("Erosão")
+def _build_erode(p, kind):
+    return p.morph_steps(kind, cv.MORPH_ERODE, 'RECT')
+
+
+@FilterPipeline.register("Dilatação")
+def _build_dilate(p, kind):
+    return p.morph_steps(kind, cv.MORPH_DILATE, 'RECT')
+
+
+@FilterPipeline.register("Abertura")
+def _build_open(p, kind):
+    return p.morph_steps(kind, cv.MORPH_OPEN, 'ELLIPSE')
+
+
+@FilterPipeline.register("Fechamento")
+def _build_close(p, kind):
+    return p.morph_steps(kind, cv.MORPH_CLOSE, 'ELLIPSE')
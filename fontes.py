@@ -0,0 +1,243 @@
+import queue
+import threading
+import time
+
+import cv2
+
+
+class VideoSource:
+    """Leitura de vídeo com decodificação em segundo plano e ritmo próprio.
+
+    O primeiro quadro é lido na abertura e guardado (`first_frame`) para a
+    pré-visualização, sem voltar o arquivo com CAP_PROP_POS_FRAMES; na
+    reprodução ele é entregue como quadro 0. Uma thread decodifica à frente
+    num buffer limitado e `frames()` entrega cada quadro no seu horário
+    (relógio monotônico). Se o consumidor se atrasar mais de um quadro,
+    quadros do buffer são pulados para manter o fps nativo.
+    """
+
+    def __init__(self, path, prefetch=8):
+        self.path = path
+        self._cap = cv2.VideoCapture(path)
+        if not self._cap.isOpened():
+            self._cap.release()
+            raise RuntimeError(f"Não foi possível abrir o vídeo: {path}")
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS) or 30.0
+        ret, frame = self._cap.read()
+        self.first_frame = frame if ret else None
+        self._queue = queue.Queue(maxsize=prefetch)
+        self._running = False
+        self._thread = None
+        self.decoded = 1 if ret else 0
+        self.delivered = 0
+        self.skipped = 0
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        if self._thread is not None:
+            raise RuntimeError("VideoSource só pode ser reproduzido uma vez.")
+        self._running = True
+        self._thread = threading.Thread(target=self._decode_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        # Libera a thread caso esteja bloqueada no buffer cheio
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._cap.release()
+
+    def _put(self, item):
+        while self._running:
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode_loop(self):
+        index = 0
+        if self.first_frame is not None:
+            if not self._put((index, self.first_frame)):
+                return
+            index += 1
+        while self._running:
+            ret, frame = self._cap.read()
+            if not ret:
+                break
+            self.decoded += 1
+            if not self._put((index, frame)):
+                return
+            index += 1
+        self._put(None)
+
+    def frames(self):
+        """Gera os quadros no ritmo do fps do arquivo."""
+        frame_time = 1.0 / self.fps
+        t0 = None
+        while self._running:
+            try:
+                item = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if item is None:
+                return
+            index, frame = item
+            now = time.monotonic()
+            if t0 is None:
+                t0 = now - index * frame_time
+            due = t0 + index * frame_time
+            if now - due > frame_time and not self._queue.empty():
+                self.skipped += 1
+                continue
+            if due > now:
+                time.sleep(due - now)
+            self.delivered += 1
+            yield frame
+
+
+class CameraSource:
+    """Captura de câmera em thread própria, publicando num conjunto de buffers.
+
+    A thread lê sempre num buffer livre (`cap.read` no array já alocado),
+    que depois vira o da frente. Os consumidores esperam por um quadro
+    novo com `acquire` (sem espera ativa), recebem o buffer da frente sem
+    cópia e devolvem com `release`; `retain` adiciona um empréstimo para
+    repassar o quadro a outro consumidor assíncrono. Buffers emprestados
+    nunca são reescritos nem seguram a captura: enquanto houver algum
+    livre (até `max_buffers`, alocados sob demanda) a captura segue, e
+    cada consumidor lento só perde os próprios quadros. Com todos
+    emprestados o quadro é descartado e contado em `dropped`. Cada quadro
+    leva timestamp monotônico e número de sequência.
+    """
+
+    def __init__(self, index=0, width=None, height=None, fps=None, buffer_size=1,
+                 backend=cv2.CAP_ANY, max_buffers=8):
+        self.index = index
+        self._cap = cv2.VideoCapture(index, backend)
+        if not self._cap.isOpened():
+            self._cap.release()
+            raise RuntimeError(f"Não foi possível acessar a câmera {index}.")
+        if width:
+            self._cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            self._cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps:
+            self._cap.set(cv2.CAP_PROP_FPS, fps)
+        if buffer_size is not None:
+            self._cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS)
+        self.max_buffers = max(2, max_buffers)
+        self._buffers = [None, None]
+        self._refs = [0, 0]
+        self._front = None
+        self._timestamp = None
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self.captured = 0
+        self.dropped = 0
+
+    @staticmethod
+    def list_available(max_index=5):
+        found = []
+        for i in range(max_index):
+            cap = cv2.VideoCapture(i)
+            if cap.isOpened():
+                found.append(i)
+            cap.release()
+        return found
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._cap.release()
+
+    def _free_slot(self):
+        """Buffer que ninguém segura e não é o da frente (chamar com _cond)."""
+        for i, refs in enumerate(self._refs):
+            if refs == 0 and i != self._front:
+                return i
+        if len(self._buffers) < self.max_buffers:
+            self._buffers.append(None)
+            self._refs.append(0)
+            return len(self._buffers) - 1
+        return None
+
+    def _capture_loop(self):
+        scratch = None
+        while self._running:
+            with self._cond:
+                back = self._free_slot()
+            # Sem buffer livre, lê num rascunho e descarta: a câmera não espera
+            target = self._buffers[back] if back is not None else scratch
+            ret, frame = self._cap.read(target)
+            if not ret:
+                break
+            ts = time.monotonic()
+            self.captured += 1
+            if back is None:
+                scratch = frame
+                self.dropped += 1
+                continue
+            self._buffers[back] = frame
+            with self._cond:
+                self._front = back
+                self._timestamp = ts
+                self._seq += 1
+                self._cond.notify_all()
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    def acquire(self, after_seq=0, timeout=None):
+        """Espera um quadro com sequência > after_seq; retorna (slot, quadro, ts, seq)."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > after_seq or not self._running, timeout):
+                return None
+            if self._seq <= after_seq:
+                return None
+            slot = self._front
+            self._refs[slot] += 1
+            return slot, self._buffers[slot], self._timestamp, self._seq
+
+    def retain(self, slot):
+        with self._cond:
+            self._refs[slot] += 1
+
+    def release(self, slot):
+        with self._cond:
+            self._refs[slot] -= 1
+
+    def snapshot(self):
+        """Cópia do quadro mais recente (para quem precisa guardar o quadro)."""
+        item = self.acquire(0, timeout=0)
+        if item is None:
+            return None
+        slot, frame, _, _ = item
+        try:
+            return frame.copy()
+        finally:
+            self.release(slot)
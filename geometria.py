@@ -0,0 +1,178 @@
+import math
+
+import cv2
+import numpy as np
+
+METRICS_DTYPE = np.dtype([
+    ("area", np.float64),          # área do contorno (Green)
+    ("perimeter", np.float64),
+    ("hull_area", np.float64),
+    ("diameter", np.float64),
+    ("circularity", np.float64),   # 4πA/P², 1 para o círculo
+    ("x", np.int32), ("y", np.int32),
+    ("w", np.int32), ("h", np.int32),
+    ("m00", np.float64), ("cx", np.float64), ("cy", np.float64),
+])
+
+
+def bbox_iou(a, b):
+    """IoU entre duas caixas (x, y, w, h, ...)."""
+    ax, ay, aw, ah = a[:4]
+    bx, by, bw, bh = b[:4]
+    iw = min(ax + aw, bx + bw) - max(ax, bx)
+    ih = min(ay + ah, by + bh) - max(ay, by)
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+def _cross(o, a, b):
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def rotating_calipers(hull):
+    """Maior distância entre vértices de um polígono convexo em O(n).
+
+    Retorna (diametro, p, q) com p e q em coordenadas (x, y).
+    """
+    pts = np.asarray(hull).reshape(-1, 2).tolist()
+    n = len(pts)
+    if n == 0:
+        return 0.0, None, None
+    if n == 1:
+        return 0.0, tuple(pts[0]), tuple(pts[0])
+
+    def d2(a, b):
+        dx, dy = a[0] - b[0], a[1] - b[1]
+        return dx * dx + dy * dy
+
+    best, bp, bq = d2(pts[0], pts[1]), pts[0], pts[1]
+    j = 1
+    for i in range(n):
+        a, b = pts[i], pts[(i + 1) % n]
+        # Avança o ponto antípoda enquanto a altura em relação à aresta (a, b) cresce
+        while abs(_cross(a, b, pts[(j + 1) % n])) > abs(_cross(a, b, pts[j])):
+            j = (j + 1) % n
+        for p in (a, b):
+            d = d2(p, pts[j])
+            if d > best:
+                best, bp, bq = d, p, pts[j]
+    return math.sqrt(best), tuple(bp), tuple(bq)
+
+
+class DiameterEngine:
+    """Diâmetro (máx. distância) por objeto e global via fecho convexo + calipers.
+
+    O fecho de cada contorno sai do cv2.convexHull (O(n log n)); o global é o
+    fecho da união dos fechos dos objetos, então os pontos internos nunca
+    entram nos calipers.
+    """
+
+    def compute(self, binary=None, contours=None, hulls=None):
+        if hulls is None:
+            if contours is None:
+                contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            hulls = [cv2.convexHull(c) for c in contours]
+        per_object = [rotating_calipers(hull) for hull in hulls]
+
+        result = {
+            "diameter": 0.0,
+            "endpoints": None,
+            "per_object": per_object,
+            "global_diameter": 0.0,
+            "global_endpoints": None,
+        }
+        if not per_object:
+            return result
+
+        best = max(per_object, key=lambda r: r[0])
+        result["diameter"] = best[0]
+        result["endpoints"] = (best[1], best[2])
+
+        global_hull = cv2.convexHull(np.concatenate(hulls))
+        d, p, q = rotating_calipers(global_hull)
+        result["global_diameter"] = d
+        result["global_endpoints"] = (p, q)
+        return result
+
+
+class ShapeMetrics:
+    """Métricas de forma de todos os objetos a partir de um só findContours.
+
+    Os contornos externos saem com CHAIN_APPROX_SIMPLE (perímetro, área e
+    momentos são os mesmos da cadeia completa, com bem menos pontos).
+    Área, momentos, perímetro e bbox são calculados em colunas para todos
+    os contornos juntos; só fecho e calipers rodam por objeto. `measure`
+    devolve um dicionário com o array estruturado `objects` (METRICS_DTYPE,
+    um registro por contorno), os contornos e fechos, os totais e as
+    mesmas chaves de diâmetro do DiameterEngine.
+    O resultado do último quadro fica em `last`.
+    """
+
+    def __init__(self):
+        self.diametro = DiameterEngine()
+        self.last = None
+
+    def measure(self, binary):
+        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        n = len(contours)
+        hulls = [cv2.convexHull(c) for c in contours]
+        objects = np.zeros(n, dtype=METRICS_DTYPE)
+        if n:
+            self._polygon_metrics(contours, objects)
+            objects["hull_area"] = np.fromiter(map(cv2.contourArea, hulls), np.float64, n)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                objects["circularity"] = np.where(objects["perimeter"] > 0,
+                                                  4 * math.pi * objects["area"] / objects["perimeter"] ** 2,
+                                                  0.0)
+
+        result = self.diametro.compute(hulls=hulls)
+        objects["diameter"] = [d for d, _, _ in result["per_object"]]
+        result.update({
+            "objects": objects,
+            "contours": contours,
+            "hulls": hulls,
+            "count": len(contours),
+            "pixel_area": int(cv2.countNonZero(binary)),
+            "area": float(objects["area"].sum()),
+            "perimeter": float(objects["perimeter"].sum()),
+        })
+        self.last = result
+        return result
+
+    @staticmethod
+    def _polygon_metrics(contours, objects):
+        """Área, momentos, perímetro e bbox de todos os contornos de uma vez.
+
+        Os vértices são concatenados e cada aresta (i, i+1, fechando no
+        primeiro vértice) entra nas somas de Green; `np.add.reduceat`
+        separa as somas por contorno. Equivale a cv2.moments/arcLength/
+        boundingRect por contorno, sem o custo de uma chamada por objeto.
+        """
+        sizes = np.fromiter((len(c) for c in contours), np.intp, len(contours))
+        starts = np.zeros(len(contours), np.intp)
+        np.cumsum(sizes[:-1], out=starts[1:])
+        pts = np.concatenate(contours).reshape(-1, 2).astype(np.float64)
+        nxt = np.arange(1, len(pts) + 1)
+        nxt[starts + sizes - 1] = starts
+        x, y = pts[:, 0], pts[:, 1]
+        x1, y1 = x[nxt], y[nxt]
+
+        cross = x * y1 - x1 * y
+        a2 = np.add.reduceat(cross, starts)
+        mx = np.add.reduceat((x + x1) * cross, starts)
+        my = np.add.reduceat((y + y1) * cross, starts)
+        area = np.abs(a2) / 2
+        objects["area"] = objects["m00"] = area
+
+        ix, iy = pts[:, 0].astype(np.int32), pts[:, 1].astype(np.int32)
+        objects["x"] = np.minimum.reduceat(ix, starts)
+        objects["y"] = np.minimum.reduceat(iy, starts)
+        objects["w"] = np.maximum.reduceat(ix, starts) - objects["x"] + 1
+        objects["h"] = np.maximum.reduceat(iy, starts) - objects["y"] + 1
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Contorno degenerado (área 0): centro do bbox
+            objects["cx"] = np.where(area > 0, mx / (3 * a2), objects["x"] + objects["w"] / 2.0)
+            objects["cy"] = np.where(area > 0, my / (3 * a2), objects["y"] + objects["h"] / 2.0)
+        objects["perimeter"] = np.add.reduceat(np.hypot(x1 - x, y1 - y), starts)
@@ -0,0 +1,189 @@
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class Recorder:
+    """Grava o fluxo processado num arquivo de vídeo, codificando em segundo plano.
+
+    `submit` só enfileira o quadro RGB (sem cópia: os quadros do pipeline
+    não são reescritos depois de publicados) numa fila limitada; com a fila
+    cheia o quadro é descartado e contado, então a exibição e a captura
+    nunca esperam pelo `cv2.VideoWriter`. A thread de gravação converte
+    para BGR e reduz por `scale` em buffers reaproveitados.
+
+    Com `max_bytes` ou `max_seconds` a gravação é dividida em segmentos
+    (`nome_000.mp4`, `nome_001.mp4`, ...); sem eles vai tudo para `path`.
+    O tamanho do vídeo é fixado pelo primeiro quadro de cada segmento.
+
+    Cada quadro leva o instante em que foi entregue; o quadro anterior é
+    repetido para cobrir quadros que não chegaram (descartados no pipeline
+    ou na fila) e quadros adiantados são pulados, então a duração do arquivo
+    acompanha o tempo real a `fps` quadros por segundo.
+    """
+
+    def __init__(self, path, codec="mp4v", fps=30.0, scale=1.0, max_bytes=None,
+                 max_seconds=None, queue_size=64):
+        if len(codec) != 4:
+            raise ValueError("O codec deve ter 4 caracteres (ex.: mp4v, XVID, MJPG).")
+        if not 0 < scale <= 1:
+            raise ValueError("A escala deve estar entre 0 e 1.")
+        self.path = path
+        self.codec = codec
+        self.fps = float(fps)
+        self.scale = scale
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._running = False
+        self._writer = None
+        self._size = None
+        self._bgr = None
+        self._small = None
+        self._segment_start = 0.0
+        self._t0 = None
+        self._last = None
+        self.segments = []
+        self.written = 0
+        self.dropped = 0
+        self.repeated = 0
+        self.error = None
+
+    @property
+    def running(self):
+        return self._running
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def start(self):
+        if self._thread is not None:
+            raise RuntimeError("Recorder só pode ser iniciado uma vez.")
+        self._running = True
+        self._thread = threading.Thread(target=self._encode_loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, rgb, timestamp=None):
+        """Enfileira um quadro RGB; retorna False se ele foi descartado."""
+        if not self._running:
+            return False
+        if timestamp is None:
+            timestamp = time.monotonic()
+        try:
+            self._queue.put_nowait((timestamp, rgb))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def stop(self, timeout=5.0):
+        """Termina de gravar o que está na fila e fecha o arquivo."""
+        if self._thread is None:
+            return
+        self._running = False
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+
+    def stats(self):
+        return {"gravados": self.written, "descartados": self.dropped, "repetidos": self.repeated,
+                "fila": self.pending, "segmentos": len(self.segments)}
+
+    # ---------- Thread de gravação ----------
+    def _segment_path(self):
+        if self.max_bytes is None and self.max_seconds is None:
+            return self.path
+        base, ext = os.path.splitext(self.path)
+        return f"{base}_{len(self.segments):03d}{ext}"
+
+    def _open_segment(self, size):
+        path = self._segment_path()
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*self.codec), self.fps, size)
+        if not writer.isOpened():
+            raise RuntimeError(f"Não foi possível gravar {path} com o codec {self.codec}.")
+        self._writer = writer
+        self._size = size
+        self._segment_start = time.monotonic()
+        self.segments.append(path)
+
+    def _close_segment(self):
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+    def _segment_full(self):
+        if self.max_seconds is not None and time.monotonic() - self._segment_start >= self.max_seconds:
+            return True
+        # O arquivo cresce aos pedaços; consultar a cada ~1 s de vídeo basta
+        if self.max_bytes is not None and self.written % max(1, int(self.fps)) == 0:
+            try:
+                return os.path.getsize(self.segments[-1]) >= self.max_bytes
+            except OSError:
+                return False
+        return False
+
+    def _prepare(self, rgb):
+        if rgb.ndim == 2:
+            rgb = cv2.cvtColor(rgb, cv2.COLOR_GRAY2RGB)
+        if self._bgr is None or self._bgr.shape != rgb.shape:
+            self._bgr = np.empty(rgb.shape, np.uint8)
+        bgr = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=self._bgr)
+        size = self._size
+        if size is None:
+            h, w = bgr.shape[:2]
+            # Vários codecs exigem dimensões pares
+            size = (max(2, int(w * self.scale)) & ~1, max(2, int(h * self.scale)) & ~1)
+        if bgr.shape[1::-1] == size:
+            return bgr, size
+        # Redução pedida, ou resolução mudou no meio do segmento
+        w, h = size
+        if self._small is None or self._small.shape[:2] != (h, w):
+            self._small = np.empty((h, w, 3), np.uint8)
+        cv2.resize(bgr, size, dst=self._small, interpolation=cv2.INTER_AREA)
+        return self._small, size
+
+    def _write(self, frame, size):
+        if self._writer is None:
+            self._open_segment(size)
+        elif self._segment_full():
+            self._close_segment()
+            self._open_segment(self._size)
+        self._writer.write(frame)
+        self.written += 1
+
+    def _encode_loop(self):
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                timestamp, rgb = item
+                if self._t0 is None:
+                    self._t0 = timestamp
+                # Posição do quadro na linha do tempo do arquivo
+                due = int((timestamp - self._t0) * self.fps)
+                if due < self.written:
+                    continue
+                # Lacuna: o quadro anterior continua na tela até este chegar.
+                # `_last` ainda aponta para o buffer de `_prepare`, intacto até a próxima chamada
+                while self._last is not None and self.written < due:
+                    self._write(self._last, self._size)
+                    self.repeated += 1
+                frame, size = self._prepare(rgb)
+                self._write(frame, size)
+                self._last = frame
+        except Exception as e:
+            # Qualquer falha encerra a gravação de forma visível para a interface
+            self.error = str(e) or type(e).__name__
+            self._running = False
+        finally:
+            self._close_segment()
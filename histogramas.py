@@ -0,0 +1,141 @@
+import cv2
+import numpy as np
+
+from quadro import Frame
+
+# canal -> (imagem do Frame, índice do canal, faixa de valores)
+CHANNELS = {
+    "B": ("bgr", 0, 256),
+    "G": ("bgr", 1, 256),
+    "R": ("bgr", 2, 256),
+    "H": ("hsv", 0, 180),
+    "S": ("hsv", 1, 256),
+    "V": ("hsv", 2, 256),
+    "cinza": ("gray", 0, 256),
+}
+
+COLORS = {
+    "B": (220, 80, 0),
+    "G": (0, 160, 0),
+    "R": (0, 0, 220),
+    "H": (180, 0, 180),
+    "S": (0, 170, 200),
+    "V": (110, 110, 110),
+    "cinza": (50, 50, 220),
+    "binario": (40, 40, 40),
+}
+
+
+def histogram(img, channel=0, bins=256):
+    """Histograma (float32, `bins` posições) de um canal de uma imagem uint8."""
+    return cv2.calcHist([img], [channel], None, [bins], [0, bins]).ravel()
+
+
+class HistogramEngine:
+    """Histogramas por canal de um quadro, opcionalmente numa janela móvel.
+
+    Os canais vêm das conversões já cacheadas no `Frame` (cinza e HSV são
+    calculados uma vez por quadro). Com `window` > 1, `update` mantém a
+    soma dos últimos `window` quadros num buffer circular: cada quadro
+    novo soma o seu histograma e subtrai o do quadro que saiu da janela.
+    """
+
+    def __init__(self, channels=("B", "G", "R", "H", "S", "V", "cinza"), window=1):
+        unknown = [c for c in channels if c not in CHANNELS]
+        if unknown:
+            raise ValueError(f"Canais desconhecidos: {unknown}")
+        self.channels = tuple(channels)
+        self.window = max(1, int(window))
+        self._ring = {c: np.zeros((self.window, CHANNELS[c][2]), np.float32) for c in self.channels}
+        self._sum = {c: np.zeros(CHANNELS[c][2], np.float32) for c in self.channels}
+        self._pos = 0
+        self.frames = 0
+
+    def compute(self, frame):
+        f = Frame.wrap(frame)
+        out = {}
+        for c in self.channels:
+            attr, index, bins = CHANNELS[c]
+            img = getattr(f, attr)
+            out[c] = histogram(img, index if img.ndim == 3 else 0, bins)
+        return out
+
+    def update(self, frame):
+        """Acrescenta um quadro à janela e retorna as somas por canal."""
+        hists = self.compute(frame)
+        for c, h in hists.items():
+            ring = self._ring[c]
+            self._sum[c] += h - ring[self._pos]
+            ring[self._pos] = h
+        self._pos = (self._pos + 1) % self.window
+        self.frames += 1
+        return self.current()
+
+    def current(self):
+        return dict(self._sum)
+
+    def reset(self):
+        for c in self.channels:
+            self._ring[c][:] = 0
+            self._sum[c][:] = 0
+        self._pos = 0
+        self.frames = 0
+
+
+class HistogramRenderer:
+    """Desenha histogramas em painéis empilhados numa imagem reaproveitada.
+
+    As barras de todos os painéis saem de uma comparação vetorizada
+    (linha >= topo da barra de cada coluna) e a imagem é preenchida por
+    um único `np.take` numa paleta (fundo/cor de cada painel); imagem,
+    máscara e índices só são alocados quando muda o número de painéis.
+    """
+
+    def __init__(self, width=512, panel_height=64, background=(255, 255, 255)):
+        self.width = width
+        self.panel_height = panel_height
+        self.background = np.array(background, np.uint8)
+        self._image = None
+        self._mask = None
+        self._index = None
+        self._base = None
+        self._rows = np.arange(panel_height, dtype=np.float32)[None, :, None]
+        self._columns = {}
+
+    def _column_bins(self, bins):
+        idx = self._columns.get(bins)
+        if idx is None:
+            idx = self._columns[bins] = np.arange(self.width) * bins // self.width
+        return idx
+
+    def render(self, hists, labels=True):
+        """`hists` é {nome: histograma}; retorna a imagem BGR (reaproveitada)."""
+        names = list(hists)
+        n, h, w = len(names), self.panel_height, self.width
+        if self._image is None or self._image.shape[0] != n * h:
+            self._image = np.empty((n * h, w, 3), np.uint8)
+            self._mask = np.empty((n, h, w), bool)
+            self._index = np.empty((n, h, w), np.intp)
+            self._base = (np.arange(n, dtype=np.intp) * 2)[:, None, None]
+
+        heights = np.empty((n, w), np.float32)
+        for i, name in enumerate(names):
+            hist = np.asarray(hists[name], np.float32)
+            cols = hist[self._column_bins(hist.size)]
+            peak = cols.max()
+            heights[i] = cols * ((h - 4) / peak) if peak > 0 else 0
+        # topo de cada barra, por painel e coluna; a máscara vira as barras
+        np.greater_equal(self._rows, (h - 1) - heights[:, None, :], out=self._mask)
+
+        palette = np.empty((n, 2, 3), np.uint8)
+        palette[:, 0] = self.background
+        palette[:, 1] = [COLORS.get(name, (0, 0, 0)) for name in names]
+        np.add(self._base, self._mask, out=self._index)
+        np.take(palette.reshape(-1, 3), self._index.reshape(-1), axis=0,
+                out=self._image.reshape(-1, 3))
+        self._image.reshape(n, h, w, 3)[:, -1] = 0
+        if labels:
+            for i, name in enumerate(names):
+                cv2.putText(self._image, name, (6, i * h + 14), cv2.FONT_HERSHEY_SIMPLEX,
+                            0.45, (0, 0, 0), 1, cv2.LINE_AA)
+        return self._image
@@ -0,0 +1,169 @@
+import bisect
+import csv
+import json
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+# Limites (ms) das faixas do histograma de latência; a última é aberta
+BINS_MS = (1, 2, 5, 10, 20, 33, 50, 100, 200, 500)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+class StageTimes:
+    """Janela das últimas latências de um estágio e o histograma dela."""
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.stamps = deque()
+        self.histogram = [0] * (len(BINS_MS) + 1)
+        self.total = 0
+
+    def add(self, ms, now, fps_window):
+        if len(self.samples) == self.samples.maxlen:
+            self.histogram[bisect.bisect_left(BINS_MS, self.samples[0])] -= 1
+        self.samples.append(ms)
+        self.histogram[bisect.bisect_left(BINS_MS, ms)] += 1
+        self.total += 1
+        self.stamps.append(now)
+        while self.stamps and now - self.stamps[0] > fps_window:
+            self.stamps.popleft()
+
+
+class Profiler:
+    """Tempos por estágio do caminho quente, com custo quase nulo desligado.
+
+    `with profiler.time("filtros"):` mede um trecho; desligado, devolve um
+    contexto vazio compartilhado (sem relógio nem alocação). Cada estágio
+    guarda uma janela deslizante das latências com histograma em faixas
+    (`BINS_MS`) e a taxa de eventos; `gauge` registra valores instantâneos
+    como profundidade de filas. Com `tracing` ligado cada medição também
+    vai para um trace exportável em CSV ou JSON; `hud` pede ao dono do
+    quadro que desenhe o resumo com `draw_hud`.
+    """
+
+    def __init__(self, window=240, fps_window=2.0, max_trace=200000):
+        self.enabled = False
+        self.tracing = False
+        self.hud = False
+        self.window = window
+        self.fps_window = fps_window
+        self.stages = {}
+        self.gauges = {}
+        self.trace = deque(maxlen=max_trace)
+        self._t0 = time.monotonic()
+        self._lock = threading.Lock()
+
+    def time(self, name):
+        if not self.enabled:
+            return _NULL
+        return _Timer(self, name)
+
+    def record(self, name, ms):
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = StageTimes(self.window)
+            stage.add(ms, now, self.fps_window)
+            if self.tracing:
+                self.trace.append((now - self._t0, name, ms))
+
+    def gauge(self, name, value):
+        if self.enabled:
+            with self._lock:
+                self.gauges[name] = value
+
+    def gauge_items(self):
+        """Cópia dos valores instantâneos (pode ser lida de qualquer thread)."""
+        with self._lock:
+            return list(self.gauges.items())
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+            self.gauges = {}
+            self.trace.clear()
+
+    def summary(self):
+        """{estágio: {ms, p50_ms, p95_ms, max_ms, fps, n, histograma}}."""
+        now = time.monotonic()
+        out = {}
+        with self._lock:
+            for name, st in self.stages.items():
+                if not st.samples:
+                    continue
+                samples = np.fromiter(st.samples, dtype=np.float64, count=len(st.samples))
+                p50, p95 = np.percentile(samples, (50, 95))
+                recent = sum(1 for t in st.stamps if now - t <= self.fps_window)
+                out[name] = {
+                    "ms": st.samples[-1], "p50_ms": float(p50), "p95_ms": float(p95),
+                    "max_ms": float(samples.max()), "fps": recent / self.fps_window,
+                    "n": st.total, "histograma": list(st.histogram),
+                }
+        return out
+
+    def status_line(self):
+        parts = [f"{name} {s['p50_ms']:.1f}/{s['p95_ms']:.1f} ms"
+                 for name, s in self.summary().items()]
+        parts += [f"{name}={value}" for name, value in self.gauge_items()]
+        return "p50/p95: " + " | ".join(parts) if parts else "Sem medições."
+
+    def draw_hud(self, img, origin=(10, 20)):
+        """Escreve as latências por estágio no canto do quadro (in-place)."""
+        x, y = origin
+        lines = [f"{name}: {s['ms']:5.1f} ms p95 {s['p95_ms']:5.1f} ({s['fps']:4.1f}/s)"
+                 for name, s in self.summary().items()]
+        lines += [f"{name}: {value}" for name, value in self.gauge_items()]
+        for i, line in enumerate(lines):
+            pos = (x, y + 18 * i)
+            cv2.putText(img, line, pos, cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 0), 3, cv2.LINE_AA)
+            cv2.putText(img, line, pos, cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 0), 1, cv2.LINE_AA)
+        return img
+
+    def export(self, path):
+        """Salva o trace (CSV) ou trace + resumo (JSON)."""
+        with self._lock:
+            trace = list(self.trace)
+        if path.lower().endswith(".json"):
+            data = {"bins_ms": list(BINS_MS), "summary": self.summary(), "gauges": dict(self.gauge_items()),
+                    "trace": [{"t": t, "stage": name, "ms": ms} for t, name, ms in trace]}
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(data, fh, ensure_ascii=False, indent=2)
+            return len(trace)
+        with open(path, "w", newline="", encoding="utf-8") as fh:
+            writer = csv.writer(fh)
+            writer.writerow(["t", "stage", "ms"])
+            writer.writerows(trace)
+        return len(trace)
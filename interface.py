@@ -15,6 +15,11 @@ class InterfaceBuilder:
         file_menu.add_command(label="Abrir imagem...", command=self.app.open_image)
         file_menu.add_command(label="Abrir vídeo...", command=self.app.open_video)
         file_menu.add_command(label="Salvar resultado", command=self.app.save_result)
+        file_menu.add_command(label="Processar imagem grande...", command=self.app.process_large_image)
+        file_menu.add_separator()
+        file_menu.add_checkbutton(label="Gravar vídeo processado", variable=self.app.var_recording,
+                                  command=self.app.toggle_recording)
+        file_menu.add_command(label="Configurar gravação...", command=self.app.configure_recording)
         file_menu.add_separator()
         file_menu.add_command(label="Sair", command=self.app.on_close)
         menubar.add_cascade(label="Arquivo", menu=file_menu)
@@ -22,15 +27,25 @@ class InterfaceBuilder:
         camera_menu = tk.Menu(menubar, tearoff=0)
         camera_menu.add_command(label="Iniciar câmera", command=self.app.start_camera)
         camera_menu.add_command(label="Parar câmera", command=self.app.stop_camera)
+        camera_menu.add_command(label="Selecionar câmera...", command=self.app.select_camera)
         menubar.add_cascade(label="Câmera", menu=camera_menu)
 
         tracking_menu = tk.Menu(menubar, tearoff=0)
         tracking_menu.add_command(label="Selecionar ROI para rastrear", command=self.app.select_roi)
+        tracking_menu.add_checkbutton(label="Rastrear múltiplos objetos", variable=self.app.var_multi_tracking,
+                                      command=self.app.toggle_multi_tracking)
+        tracking_menu.add_command(label="Avaliar trackers", command=self.app.benchmark_trackers)
         tracking_menu.add_command(label="Carregar template...", command=self.app.load_template)
         tracking_menu.add_command(label="Carregar música...", command=self.app.load_music)
         menubar.add_cascade(label="Rastreamento", menu=tracking_menu)
 
         help_menu = tk.Menu(menubar, tearoff=0)
+        help_menu.add_command(label="Desempenho do pipeline", command=self.app.show_pipeline_stats)
+        help_menu.add_checkbutton(label="Instrumentação por estágio", variable=self.app.var_profiling,
+                                  command=self.app.toggle_profiling)
+        help_menu.add_checkbutton(label="Mostrar HUD de desempenho", variable=self.app.var_hud,
+                                  command=self.app.toggle_hud)
+        help_menu.add_command(label="Exportar trace...", command=self.app.export_trace)
         help_menu.add_command(
             label="Sobre",
             command=lambda: messagebox.showinfo(
@@ -67,7 +82,11 @@ class InterfaceBuilder:
             "Abertura", "Fechamento"
         ]
         tk.OptionMenu(effects_frame, self.app.effect_var, *effect_options,
-                      command=lambda _: self.app._update_status()).pack(side=tk.LEFT, padx=10)
+                      command=lambda _: self.app._on_filters_changed()).pack(side=tk.LEFT, padx=10)
+        tk.Button(effects_frame, text="Adicionar à cadeia", command=self.app.add_filter_to_chain).pack(side=tk.LEFT, padx=5)
+        tk.Button(effects_frame, text="Limpar cadeia", command=self.app.clear_filter_chain).pack(side=tk.LEFT, padx=5)
+        self.app.chain_var = tk.StringVar(value="Cadeia: -")
+        tk.Label(effects_frame, textvariable=self.app.chain_var, anchor="w").pack(side=tk.LEFT, padx=10)
 
         analysis_frame = tk.LabelFrame(self.root, text="Análise de imagem binária")
         analysis_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=5)
@@ -79,7 +98,26 @@ class InterfaceBuilder:
             "Diâmetro (máx. distância)", "Contagem de objetos (crescimento de região)"
         ]
         tk.OptionMenu(analysis_frame, self.app.analysis_var, *analysis_options).pack(side=tk.LEFT, padx=10)
+        binarization_modes = {
+            "Limiar fixo (127)": "fixo", "Otsu": "otsu",
+            "Adaptativo (média)": "media", "Adaptativo (gaussiano)": "gaussiano",
+        }
+        self.app.binarization_var = tk.StringVar(value="Limiar fixo (127)")
+        tk.OptionMenu(analysis_frame, self.app.binarization_var, *binarization_modes,
+                      command=lambda label: self.app.set_binarization(binarization_modes[label])
+                      ).pack(side=tk.LEFT, padx=10)
+        overlay_modes = {"Rótulos preenchidos": "fill", "Contorno dos rótulos": "outline"}
+        self.app.overlay_mode_var = tk.StringVar(value="fill")
+        # Guardada no app: uma StringVar sem referência é coletada e some do menu
+        self.app.overlay_label_var = tk.StringVar(value="Rótulos preenchidos")
+        tk.OptionMenu(analysis_frame, self.app.overlay_label_var, *overlay_modes,
+                      command=lambda label: self.app.overlay_mode_var.set(overlay_modes[label])
+                      ).pack(side=tk.LEFT, padx=10)
         tk.Button(analysis_frame, text="Executar análise", command=self.app.run_analysis).pack(side=tk.LEFT, padx=10)
+        tk.Checkbutton(analysis_frame, text="Análise contínua", variable=self.app.var_streaming,
+                       command=self.app.toggle_streaming).pack(side=tk.LEFT, padx=10)
+        tk.Checkbutton(analysis_frame, text="Histograma ao vivo", variable=self.app.var_live_histogram,
+                       command=self.app.toggle_live_histogram).pack(side=tk.LEFT, padx=10)
 
         results_frame = tk.LabelFrame(self.root, text="Resultados")
         results_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=5)
@@ -93,7 +131,6 @@ class InterfaceBuilder:
 
         self.app.canvas = tk.Canvas(canvas_frame, bg="#222", highlightthickness=0)
         self.app.canvas.pack(fill=tk.BOTH, expand=True)
-        self.app.canvas_image_id = None
 
     def build_status(self):
         status_frame = tk.Frame(self.root)
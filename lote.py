@@ -0,0 +1,272 @@
+"""Processamento em lote, sem interface gráfica.
+
+Exemplos:
+    python lote.py video.mp4 -o saida/ -f "Suavização (Mediana)" Otsu Abertura --measure
+    python lote.py "scans/*.png" -o saida/ --template peca.png --results medidas.json
+    python lote.py turno1.mp4 turno2.mp4 -o saida/ --detect -j 4
+
+Não importa tkinter nem pygame: roda em servidor.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+
+import cv2
+
+from filtros import filtros
+from medicoes import Measurer
+from video import VideoProcessor
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+
+
+def image_paths(source):
+    """Imagens de uma pasta, glob ou arquivo de imagem; None se a fonte é vídeo."""
+    if os.path.isdir(source):
+        return sorted(p for p in glob.glob(os.path.join(source, "*"))
+                      if p.lower().endswith(IMAGE_EXTS))
+    if any(ch in source for ch in "*?["):
+        return sorted(glob.glob(source))
+    if source.lower().endswith(IMAGE_EXTS):
+        return [source]
+    return None
+
+
+def input_root(sources):
+    """Pasta comum a todas as entradas; os nomes de saída são relativos a ela.
+
+    Assim `a/img.png` e `b/img.png` viram `a/img.png` e `b/img.png` na saída
+    em vez de um sobrescrever o outro.
+    """
+    dirs = []
+    for source in sources:
+        paths = image_paths(source)
+        dirs.extend(os.path.dirname(os.path.abspath(p)) for p in (paths or [source]))
+    if not dirs:
+        return None
+    try:
+        return os.path.commonpath(dirs)
+    except ValueError:
+        # Unidades diferentes no Windows: não há raiz comum
+        return None
+
+
+def output_name(path, root=None):
+    return os.path.relpath(path, root) if root else os.path.basename(path)
+
+
+def iter_inputs(source, root=None):
+    """Gera (nome, índice, timestamp_ms, quadro BGR) para vídeo, pasta ou glob.
+
+    O nome é o caminho relativo a `root` (ou só o nome do arquivo, sem `root`).
+    """
+    paths = image_paths(source)
+    if paths is not None:
+        for i, path in enumerate(paths):
+            img = cv2.imread(path)
+            if img is None:
+                print(f"Aviso: não foi possível ler {path}", file=sys.stderr)
+                continue
+            yield output_name(path, root), i, None, img
+        return
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise RuntimeError(f"Não foi possível abrir o vídeo: {source}")
+    try:
+        i = 0
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield output_name(source, root), i, cap.get(cv2.CAP_PROP_POS_MSEC), frame
+            i += 1
+    finally:
+        cap.release()
+
+
+def video_fps(source, default=30.0):
+    cap = cv2.VideoCapture(source)
+    fps = cap.get(cv2.CAP_PROP_FPS) if cap.isOpened() else 0
+    cap.release()
+    return fps or default
+
+
+class BatchProcessor:
+    """Aplica filtros, detecção/rastreamento e medições quadro a quadro."""
+
+    def __init__(self, chain=(), template=None, detect=False, measure=False,
+                 tracker_backend=None, tracking_scale=1.0, multi=False):
+        self.filtros = filtros()
+        self.filtros.set_chain(chain)
+        self.video_processor = VideoProcessor(audio=False)
+        self.video_processor.tracker_backend = tracker_backend
+        self.video_processor.tracking_scale = tracking_scale
+        self.video_processor.multi_tracking = multi
+        if template:
+            self.video_processor.load_template(template)
+        self.detect = detect
+        self.measurer = Measurer() if measure else None
+
+    def process(self, bgr):
+        """Retorna (quadro anotado BGR, dicionário de resultados)."""
+        start = time.perf_counter()
+        frame = self.filtros._filter_frame(bgr)
+        vp = self.video_processor
+        vp.update_tracker(frame)
+        if self.detect:
+            vp.detect_purple_bottle(frame)
+        vp.detect_template(frame)
+
+        row = {
+            "tracking": vp.tracking,
+            "track_window": list(vp.track_window) if vp.tracking and vp.track_window else None,
+            "template_matches": len(vp.template_matches),
+            "template_confidence": max((m[4] for m in vp.template_matches), default=None),
+        }
+        if vp.multi_tracking and vp.track_manager is not None:
+            row["tracks"] = {t.id: list(t.bbox) for t in vp.track_manager.tracks.values()}
+        if self.measurer is not None:
+            binary = self.filtros._ensure_binary(frame, self.filtros.pipeline.output_kind)
+            row.update(self.measurer.measure(binary))
+        row["latency_ms"] = (time.perf_counter() - start) * 1000
+        return frame.output_bgr(), row
+
+
+def is_video_source(source):
+    return image_paths(source) is None
+
+
+def serial_results(proc, source, root=None):
+    for name, index, ts, bgr in iter_inputs(source, root):
+        out, row = proc.process(bgr)
+        yield name, index, ts, out, row
+
+
+def run_source(proc, source, output_dir=None, codec="mp4v", results=None, root=None):
+    """Consome os resultados de uma fonte, grava a saída anotada e retorna as linhas.
+
+    As saídas repetem as subpastas das entradas relativas a `root`.
+    """
+    if results is None:
+        results = serial_results(proc, source, root)
+    is_video = is_video_source(source)
+    writer = None
+    rows = []
+    try:
+        for name, index, ts, out, row in results:
+            rows.append(dict({"source": name, "frame": index, "timestamp_ms": ts}, **row))
+            if not output_dir:
+                continue
+            if is_video:
+                if writer is None:
+                    h, w = out.shape[:2]
+                    base = os.path.splitext(os.path.join(output_dir, name))[0]
+                    os.makedirs(os.path.dirname(base), exist_ok=True)
+                    writer = cv2.VideoWriter(f"{base}_anotado.mp4",
+                                             cv2.VideoWriter_fourcc(*codec),
+                                             video_fps(source), (w, h))
+                writer.write(out)
+            else:
+                path = os.path.join(output_dir, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                cv2.imwrite(path, out)
+    finally:
+        if writer is not None:
+            writer.release()
+    return rows
+
+
+def write_results(path, rows):
+    if path.lower().endswith(".json"):
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(rows, fh, ensure_ascii=False, indent=2)
+        return
+    fields = []
+    for row in rows:
+        for k in row:
+            if k not in fields:
+                fields.append(k)
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.DictWriter(fh, fieldnames=fields)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: json.dumps(v) if isinstance(v, (list, dict)) else v
+                             for k, v in row.items()})
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Processamento em lote de vídeos e imagens (sem interface).")
+    parser.add_argument("input", nargs="+", help="arquivos de vídeo, pastas de imagens ou globs (entre aspas)")
+    parser.add_argument("-o", "--output", help="pasta de saída para imagens/vídeo anotados")
+    parser.add_argument("-f", "--filters", nargs="*", default=[],
+                        help="cadeia de efeitos de filtros.py, na ordem (ex.: Otsu Abertura)")
+    parser.add_argument("--template", help="imagem de template para detecção")
+    parser.add_argument("--detect", action="store_true", help="detecta e rastreia a garrafa roxa")
+    parser.add_argument("--multi", action="store_true", help="rastreia vários objetos (com --detect)")
+    parser.add_argument("--tracker", help="backend do tracker (CSRT, KCF, MIL, MOSSE...)")
+    parser.add_argument("--tracking-scale", type=float, default=1.0, help="escala do quadro para rastrear")
+    parser.add_argument("--measure", action="store_true", help="mede área, perímetro, diâmetro e objetos")
+    parser.add_argument("--results", help="tabela de resultados por quadro (.csv ou .json)")
+    parser.add_argument("--codec", default="mp4v", help="FourCC do vídeo de saída")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="processos em paralelo (quadros sem estado ou um vídeo por worker)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    config = {
+        "chain": args.filters, "template": args.template, "detect": args.detect,
+        "measure": args.measure, "tracker_backend": args.tracker,
+        "tracking_scale": args.tracking_scale, "multi": args.multi,
+    }
+    try:
+        proc = BatchProcessor(**config)
+    except ValueError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 2
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+    root = input_root(args.input)
+
+    # Rastreamento tem estado: em paralelo, cada vídeo fica num só worker
+    stateful = args.detect or args.multi
+    rows = []
+    executor = None
+    start = time.perf_counter()
+    try:
+        if args.workers > 1:
+            from paralelo import ParallelExecutor
+            executor = ParallelExecutor(config, args.workers)
+        if executor is not None and stateful:
+            for _, source_rows in executor.map_streams(args.input, args.output, args.codec, root):
+                rows.extend(source_rows)
+        else:
+            for source in args.input:
+                results = None
+                if executor is not None:
+                    frames = (((name, i, ts), bgr) for name, i, ts, bgr in iter_inputs(source, root))
+                    results = (meta + (out, row) for meta, out, row in executor.map_frames(frames))
+                rows.extend(run_source(proc, source, args.output, args.codec, results, root))
+    except RuntimeError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+
+    if args.results:
+        write_results(args.results, rows)
+    elapsed = time.perf_counter() - start
+    fps = len(rows) / elapsed if elapsed > 0 else 0.0
+    print(f"{len(rows)} quadros processados em {elapsed:.1f} s ({fps:.1f} quadros/s)")
+    if executor is not None:
+        for pid, st in sorted(executor.stats().items()):
+            print(f"  worker {pid}: {st['frames']} quadros, {st['fps']:.1f} quadros/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
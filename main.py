@@ -1,15 +1,26 @@
 import cv2
+import queue
 import threading
 import numpy as np
-from PIL import Image, ImageTk
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, simpledialog
 from video import VideoProcessor
 from filtros import filtros
 from interface import InterfaceBuilder
 from analises import Analise
+from pipeline import FramePipeline, LatestSlot
+from fontes import VideoSource, CameraSource
+from exibicao import CanvasDisplay
+from cache import ResultCache, image_key
+from instrumentacao import Profiler
+from mosaico import TiledImage, TiledProcessor, RAW_EXTS
+from gravacao import Recorder
+import os
 import time
 
+# Arquivos acima deste tamanho abrem em blocos (mapeados em memória)
+LARGE_IMAGE_BYTES = 64 * 1024 * 1024
+
 class App:
     def __init__(self, root):
         self.root = root
@@ -27,19 +38,44 @@ class App:
         self.roi_rect_id = None
         self.roi_coords = None
         self.image_bgr = None
-        self.cap = None
+        self.tiled = None
+        self.view = None
+        self._pan_start = None
+        # Leitura/redução da região visível roda numa thread; o Tk só aplica o resultado
+        self._viewport_requests = LatestSlot()
+        self._viewport_results = queue.Queue()
+        self._viewport_seq = 0
+        self._viewport_thread = None
+        self.camera = None
+        self.camera_index = 0
+        self.camera_config = {"width": None, "height": None, "fps": None, "buffer_size": 1}
+        self.recorder = None
+        # fps None: usa o da câmera/vídeo; segmentos 0: arquivo único
+        self.recording_config = {"codec": "mp4v", "fps": None, "scale": 1.0,
+                                 "segment_mb": 0, "segment_minutes": 0}
         self.running = False
-        self.frame = None
         self.lock = threading.Lock()
-        self.video_cap = None
+        self.video_source = None
         self.video_running = False
         self.video_frame = None
         self.video_path = None
+        self.filter_chain = []
+        self.process_lock = threading.RLock()
+        self.cache = ResultCache()
+        self.profiler = Profiler()
+        self._last_status = 0.0
+        self.frame_pipeline = FramePipeline(self._process_frame)
 
         # Filtros
         self.var_gray = tk.BooleanVar(value=False)
         self.var_negative = tk.BooleanVar(value=False)
         self.var_otsu = tk.BooleanVar(value=False)
+        self.var_streaming = tk.BooleanVar(value=False)
+        self.var_live_histogram = tk.BooleanVar(value=False)
+        self.var_multi_tracking = tk.BooleanVar(value=False)
+        self.var_profiling = tk.BooleanVar(value=False)
+        self.var_hud = tk.BooleanVar(value=False)
+        self.var_recording = tk.BooleanVar(value=False)
 
         # Interface
         ui = InterfaceBuilder(self, self.root)
@@ -47,9 +83,18 @@ class App:
         ui.build_controls()
         ui.build_canvas()
         ui.build_status()
+        self.display = CanvasDisplay(self.canvas)
+        self._bind_viewport()
 
+        self.frame_pipeline.start()
         self.root.after(50, self._refresh_canvas)
 
+    @property
+    def frame(self):
+        """Cópia do quadro mais recente da câmera (None sem câmera)."""
+        camera = self.camera
+        return camera.snapshot() if camera is not None else None
+
     # ---------- Seleção de ROI ----------
     def select_roi(self):
         if self.frame is None:
@@ -81,30 +126,20 @@ class App:
             return
         x0, y0 = self.roi_start
         x1, y1 = event.x, event.y
-        canvas_w = self.canvas.winfo_width()
-        canvas_h = self.canvas.winfo_height()
-
-        if self.frame is not None:
-            img_h, img_w = self.frame.shape[:2]
-            scale = min(canvas_w / img_w, canvas_h / img_h)
-            new_w, new_h = int(img_w * scale), int(img_h * scale)
-            offset_x = (canvas_w - new_w) // 2
-            offset_y = (canvas_h - new_h) // 2
-
-            x0, x1 = x0 - offset_x, x1 - offset_x
-            y0, y1 = y0 - offset_y, y1 - offset_y
-            x0, x1 = int(x0 / scale), int(x1 / scale)
-            y0, y1 = int(y0 / scale), int(y1 / scale)
-
-            x0 = max(0, min(x0, img_w))
-            y0 = max(0, min(y0, img_h))
-            x1 = max(0, min(x1, img_w))
-            y1 = max(0, min(y1, img_h))
-
+        frame = self.frame
+        p0 = self.display.to_image(x0, y0)
+        p1 = self.display.to_image(x1, y1)
+        if frame is not None and p0 is not None:
+            # Escala e deslocamentos vêm do que está desenhado no canvas
+            (x0, y0), (x1, y1) = p0, p1
             bbox = (min(x0, x1), min(y0, y1), abs(x1 - x0), abs(y1 - y0))
             if bbox[2] > 10 and bbox[3] > 10:
                 self.roi_coords = bbox
-                self.video_processor.init_tracker(self.frame, bbox)
+                with self.process_lock:
+                    if self.video_processor.multi_tracking:
+                        self.video_processor.add_target(frame, bbox)
+                    else:
+                        self.video_processor.init_tracker(frame, bbox)
                 self._update_status(f"Rastreamento iniciado: {bbox}")
             else:
                 self._update_status("ROI muito pequena. Selecione uma área maior.")
@@ -125,14 +160,192 @@ class App:
         )
         if not path:
             return
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".npy" or ext in RAW_EXTS or os.path.getsize(path) > LARGE_IMAGE_BYTES:
+            self.open_large_image(path)
+            return
         img = cv2.imread(path)
-        img
         if img is None:
             messagebox.showerror("Erro", "Não foi possível carregar a imagem.")
             return
+        self.tiled = None
         self.image_bgr = img
+        self._submit_static()
         self._update_status(f"Imagem carregada: {path}")
 
+    # ---------- Imagens grandes (em blocos) ----------
+    def open_large_image(self, path):
+        shape = None
+        if os.path.splitext(path)[1].lower() in RAW_EXTS:
+            answer = simpledialog.askstring("Arquivo bruto", "Altura, largura e canais (ex.: 20000 30000 3):",
+                                            parent=self.root)
+            if not answer:
+                return
+            try:
+                shape = tuple(int(v) for v in answer.replace(",", " ").split())
+            except ValueError:
+                messagebox.showerror("Erro", "Formato inválido.")
+                return
+        # Decodificar/converter para .npy pode levar minutos: fora da thread do Tk
+        events = queue.Queue()
+
+        def work():
+            try:
+                events.put(("ok", TiledImage.open(path, shape=shape)))
+            except (OSError, ValueError, RuntimeError) as e:
+                events.put(("erro", str(e)))
+
+        threading.Thread(target=work, daemon=True).start()
+        self._update_status(f"Abrindo imagem em blocos: {path}...")
+        self.root.after(100, self._poll_large_open, events, path)
+
+    def _poll_large_open(self, events, path):
+        try:
+            status, value = events.get_nowait()
+        except queue.Empty:
+            self.root.after(100, self._poll_large_open, events, path)
+            return
+        if status == "erro":
+            messagebox.showerror("Erro", f"Não foi possível abrir a imagem: {value}")
+            return
+        self._set_tiled(value)
+        self._update_status(f"Imagem em blocos: {path} ({value.width}x{value.height}, "
+                            f"{value.megapixels:.0f} MP)")
+
+    def _set_tiled(self, tiled):
+        self.tiled = tiled
+        self.view = (0, 0, tiled.width, tiled.height)
+        self._render_viewport()
+
+    def _render_viewport(self):
+        """Pede a região visível, já no tamanho do canvas, à thread de viewport.
+
+        A thread pode montar um nível reduzido inteiro (a primeira vista de
+        uma imagem enorme); o resultado é aplicado por `_apply_viewport` no
+        próximo tick do Tk. Pedidos novos substituem os pendentes.
+        """
+        x, y, w, h = self.view
+        cw, ch = self.display.canvas_size
+        if cw <= 1 or ch <= 1:
+            cw, ch = 800, 500
+        scale = min(cw / w, ch / h)
+        out = (max(1, int(w * scale)), max(1, int(h * scale)))
+        self._viewport_seq += 1
+        self._viewport_requests.put(self._viewport_seq, (self.tiled, self.view, out))
+        if self._viewport_thread is None:
+            self._viewport_thread = threading.Thread(target=self._viewport_loop, daemon=True)
+            self._viewport_thread.start()
+
+    def _viewport_loop(self):
+        while True:
+            item = self._viewport_requests.get(timeout=0.5)
+            if item is None:
+                continue
+            tiled, (x, y, w, h), (ow, oh) = item[2]
+            try:
+                img = tiled.viewport(x, y, w, h, ow, oh)
+            except Exception as e:
+                print("Erro ao montar a região visível:", e)
+                continue
+            self._viewport_results.put((tiled, img))
+
+    def _apply_viewport(self):
+        img = None
+        while True:
+            try:
+                tiled, result = self._viewport_results.get_nowait()
+            except queue.Empty:
+                break
+            if tiled is self.tiled:
+                img = result
+        if img is not None:
+            self.image_bgr = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR) if img.ndim == 2 else img
+            self._submit_static()
+
+    def _bind_viewport(self):
+        self.canvas.bind("<MouseWheel>", lambda e: self._zoom(e, 0.8 if e.delta > 0 else 1.25), add="+")
+        self.canvas.bind("<Button-4>", lambda e: self._zoom(e, 0.8), add="+")
+        self.canvas.bind("<Button-5>", lambda e: self._zoom(e, 1.25), add="+")
+        self.canvas.bind("<ButtonPress-3>", self._on_pan_start, add="+")
+        self.canvas.bind("<B3-Motion>", self._on_pan, add="+")
+
+    def _clamp_view(self, x, y, w, h):
+        W, H = self.tiled.width, self.tiled.height
+        w, h = min(max(w, 16), W), min(max(h, 16), H)
+        return max(0, min(x, W - w)), max(0, min(y, H - h)), w, h
+
+    def _zoom(self, event, factor):
+        if self.tiled is None or self.running or self.video_running:
+            return
+        p = self.display.to_image(event.x, event.y)
+        x, y, w, h = self.view
+        shown = self.image_bgr.shape
+        # Ponto sob o cursor fica parado
+        fx, fy = (p[0] / shown[1], p[1] / shown[0]) if p else (0.5, 0.5)
+        nw, nh = w * factor, h * factor
+        self.view = self._clamp_view(x + fx * (w - nw), y + fy * (h - nh), nw, nh)
+        self._render_viewport()
+
+    def _on_pan_start(self, event):
+        self._pan_start = (event.x, event.y, self.view)
+
+    def _on_pan(self, event):
+        if (self.tiled is None or self.running or self.video_running
+                or self._pan_start is None or self.display.scale is None):
+            return
+        x0, y0, (x, y, w, h) = self._pan_start
+        # pixels do canvas → pixels da imagem completa
+        ratio = w / (self.image_bgr.shape[1] * self.display.scale)
+        self.view = self._clamp_view(x - (event.x - x0) * ratio, y - (event.y - y0) * ratio, w, h)
+        self._render_viewport()
+
+    def process_large_image(self):
+        if self.tiled is None:
+            messagebox.showinfo("Info", "Abra uma imagem grande (.npy, bruta ou acima de "
+                                        f"{LARGE_IMAGE_BYTES // 2 ** 20} MB) primeiro.")
+            return
+        path = filedialog.asksaveasfilename(title="Salvar resultado em blocos", defaultextension=".npy",
+                                            filetypes=[("NumPy", "*.npy")])
+        if not path:
+            return
+        names = [n for n in (self.filter_chain or [self.effect_var.get()]) if n != "Nenhum"]
+        processor = TiledProcessor(names, binarizer=self.filtros.binarizer,
+                                   kernels=self.filtros._get_kernel)
+        source = self.tiled
+        # O worker só publica mensagens; a interface é atualizada por _poll_large_image
+        events = queue.Queue()
+
+        def work():
+            try:
+                result = processor.run(source, path, lambda done, total: events.put(("progresso", (done, total))))
+            except Exception as e:
+                events.put(("erro", str(e)))
+                return
+            events.put(("pronto", result))
+
+        threading.Thread(target=work, daemon=True).start()
+        self.root.after(100, self._poll_large_image, events, path)
+
+    def _poll_large_image(self, events, path):
+        progress = None
+        while True:
+            try:
+                kind, value = events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progresso":
+                progress = value
+            elif kind == "erro":
+                messagebox.showerror("Erro", f"Falha no processamento: {value}")
+                return
+            else:
+                self._set_tiled(value)
+                self._update_status(f"Resultado salvo em: {path}")
+                return
+        if progress is not None:
+            self._update_status(f"Processando blocos: {progress[0]}/{progress[1]}")
+        self.root.after(100, self._poll_large_image, events, path)
+
     def open_video(self):
         path = filedialog.askopenfilename(
             title="Selecionar vídeo",
@@ -140,16 +353,20 @@ class App:
         )
         if not path:
             return
-        cap = cv2.VideoCapture(path)
-        if not cap or not cap.isOpened():
+        try:
+            source = VideoSource(path)
+        except RuntimeError:
             messagebox.showerror("Erro", "Não foi possível abrir o vídeo.")
             return
-        self.video_cap = cap
+        if self.video_source is not None:
+            self.video_source.stop()
+        self.video_source = source
         self.video_path = path
-        ret, frame = cap.read()
+        frame = source.first_frame
         with self.lock:
-            self.video_frame = frame if ret else None
-        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.video_frame = frame
+        if frame is not None:
+            self.frame_pipeline.submit(frame)
         self._update_status(f"Vídeo carregado: {path}")
 
     def load_template(self):
@@ -157,9 +374,39 @@ class App:
             filetypes=[("Todos", "*.*")]
         )
         if path:
-            self.video_processor.load_template(path)
+            with self.process_lock:
+                self.video_processor.load_template(path)
+            self._submit_static()
             self._update_status(f"Template carregado: {path}")
 
+    def toggle_multi_tracking(self):
+        with self.process_lock:
+            self.video_processor.multi_tracking = self.var_multi_tracking.get()
+            # Ligando ou desligando, começa do zero; a ThreadPool só existe enquanto houver uso
+            self.video_processor.close_tracks()
+        self._update_status("Rastreamento múltiplo " +
+                            ("ativado." if self.var_multi_tracking.get() else "desativado."))
+
+    def benchmark_trackers(self):
+        if self.running:
+            frame = self.frame
+        else:
+            with self.lock:
+                frame = self.video_frame if self.video_running else self.image_bgr
+        if frame is None:
+            messagebox.showinfo("Info", "Nenhum quadro disponível para avaliar os trackers.")
+            return
+        h, w = frame.shape[:2]
+        bbox = self.roi_coords or (w // 4, h // 4, w // 2, h // 2)
+        with self.process_lock:
+            results = self.video_processor.benchmark_trackers(frame, bbox)
+            chosen = self.video_processor.tracker_backend
+        if not results:
+            messagebox.showinfo("Trackers", "Nenhum tracker disponível no OpenCV instalado.")
+            return
+        lines = [f"{name}: {ms:.1f} ms" for name, ms in sorted(results.items(), key=lambda r: r[1])]
+        messagebox.showinfo("Trackers", "\n".join(lines) + f"\n\nSelecionado: {chosen}")
+
     def load_music(self):
         path = filedialog.askopenfilename(title="Selecionar música",
             filetypes=[("Todos", "*.*")]
@@ -172,38 +419,40 @@ class App:
         if self.video_running:
             self._update_status("Vídeo já em reprodução.")
             return
-        if self.video_cap is None and self.video_path:
-            self.video_cap = cv2.VideoCapture(self.video_path)
-        if not self.video_cap or not self.video_cap.isOpened():
+        if self.video_source is None and self.video_path:
+            try:
+                self.video_source = VideoSource(self.video_path)
+            except RuntimeError:
+                self.video_source = None
+        if self.video_source is None:
             messagebox.showinfo("Info", "Abra um vídeo antes de iniciar.")
             return
         self.video_running = True
-        threading.Thread(target=self._video_loop, daemon=True).start()
+        self.video_source.start()
+        threading.Thread(target=self._video_loop, args=(self.video_source,), daemon=True).start()
         self._update_status("Reprodução de vídeo iniciada.")
 
     def stop_video(self):
         self.video_running = False
-        if self.video_cap:
-            self.video_cap.release()
-        self.video_cap = None
+        if self.video_source:
+            self.video_source.stop()
+        self.video_source = None
         self.video_frame = None
+        self._submit_static()
         self._update_status("Vídeo parado.")
 
-    def _video_loop(self):
-        cap = self.video_cap
-        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
-        frame_time = 1.0 / fps
-        while self.video_running and cap.isOpened():
-            start_time = time.time()
-            ret, frame = cap.read()
-            if not ret:
+    def _video_loop(self, source):
+        # Decodificação e ritmo ficam no VideoSource
+        for frame in source.frames():
+            if not self.video_running:
                 break
             with self.lock:
                 self.video_frame = frame
-            sleep_time = frame_time - (time.time() - start_time)
-            if sleep_time > 0:
-                time.sleep(sleep_time)
-        cap.release()
+            self.analisador.stream.submit(frame)
+            self.frame_pipeline.submit(frame)
+        source.stop()
+        if self.video_source is source:
+            self.video_source = None
         self.video_running = False
 
     def start_camera(self):
@@ -211,34 +460,72 @@ class App:
             self._update_status("Câmera já em execução.")
             return
         try:
-            self.cap = cv2.VideoCapture(0)
-            if not self.cap.isOpened():
-                raise RuntimeError("Não foi possível acessar a câmera.")
-            self.running = True
-            threading.Thread(target=self._camera_loop, daemon=True).start()
-            self._update_status("Câmera iniciada.")
-        except Exception as e:
+            self.camera = CameraSource(self.camera_index, **self.camera_config)
+        except RuntimeError as e:
             messagebox.showerror("Erro", str(e))
+            return
+        self.running = True
+        self.camera.start()
+        threading.Thread(target=self._camera_loop, args=(self.camera,), daemon=True).start()
+        self._update_status(f"Câmera {self.camera_index} iniciada.")
 
     def stop_camera(self):
         self.running = False
-        if self.cap:
-            self.cap.release()
-        self.cap = None
+        camera, self.camera = self.camera, None
+        if camera is not None:
+            camera.stop()
+        self._submit_static()
         self._update_status("Câmera parada.")
 
-    def _camera_loop(self):
-        while self.running and self.cap and self.cap.isOpened():
-            ret, frame = self.cap.read()
-            if not ret:
-                break
-            with self.lock:
-                self.frame = frame
-            cv2.waitKey(1)
+    def select_camera(self):
+        found = CameraSource.list_available()
+        index = simpledialog.askinteger(
+            "Câmera", f"Índice da câmera (encontradas: {found or 'nenhuma'}):",
+            initialvalue=self.camera_index, minvalue=0, parent=self.root)
+        if index is None:
+            return
+        self.camera_index = index
+        if self.running:
+            self.stop_camera()
+            self.start_camera()
+        else:
+            self._update_status(f"Câmera selecionada: {index}")
+
+    def _camera_loop(self, camera):
+        # Acorda só quando a câmera publica um quadro novo; o buffer é
+        # emprestado (sem cópia) a cada consumidor e volta com release
+        seq = 0
+        while self.running and camera.running:
+            item = camera.acquire(seq, timeout=0.5)
+            if item is None:
+                continue
+            slot, frame, _, seq = item
+            try:
+                camera.retain(slot)
+                self.analisador.stream.submit(frame, release=lambda s=slot: camera.release(s))
+                camera.retain(slot)
+                self.frame_pipeline.submit(frame, release=lambda s=slot: camera.release(s))
+            finally:
+                camera.release(slot)
+        if self.camera is camera:
+            self.running = False
 
     def run_analysis(self):
         self.analisador.run_analysis()
 
+    def toggle_streaming(self):
+        self.analisador.toggle_streaming(self.var_streaming.get())
+
+    def set_binarization(self, mode):
+        # Vale para as análises, a análise contínua e a morfologia da cadeia
+        with self.process_lock:
+            self.filtros.set_binarization(mode)
+        self._submit_static()
+        self._update_status(f"Binarização: {self.binarization_var.get()}")
+
+    def toggle_live_histogram(self):
+        self.analisador.toggle_live_histogram(self.var_live_histogram.get())
+
     def save_result(self):
         img = self._get_current_processed_image()
         if img is None:
@@ -257,52 +544,271 @@ class App:
         else:
             messagebox.showerror("Erro", "Falha ao salvar imagem.")
 
+    # ---------- Gravação ----------
+    def toggle_recording(self):
+        if self.var_recording.get():
+            self.start_recording()
+        else:
+            self.stop_recording()
+
+    def start_recording(self):
+        if self.recorder is not None:
+            return
+        path = filedialog.asksaveasfilename(
+            title="Gravar vídeo processado", defaultextension=".mp4",
+            filetypes=[("MP4", "*.mp4"), ("AVI", "*.avi"), ("Todos os arquivos", "*.*")])
+        if not path:
+            self.var_recording.set(False)
+            return
+        cfg = self.recording_config
+        fps = cfg["fps"]
+        if fps is None:
+            if self.video_source is not None:
+                fps = self.video_source.fps
+            elif self.camera is not None:
+                fps = self.camera.fps or 30.0
+            else:
+                fps = 30.0
+        try:
+            recorder = Recorder(path, cfg["codec"], fps, cfg["scale"],
+                                max_bytes=cfg["segment_mb"] * 2 ** 20 or None,
+                                max_seconds=cfg["segment_minutes"] * 60 or None)
+        except ValueError as e:
+            messagebox.showerror("Erro", str(e))
+            self.var_recording.set(False)
+            return
+        recorder.start()
+        self.recorder = recorder
+        self._update_status(f"Gravando em: {path} ({cfg['codec']}, {fps:.0f} fps)")
+        self.root.after(500, self._poll_recording)
+
+    def stop_recording(self):
+        recorder, self.recorder = self.recorder, None
+        self.var_recording.set(False)
+        if recorder is None:
+            return
+        # Termina a fila fora da thread do Tk; o resultado é lido por _poll_recording_end
+        finisher = threading.Thread(target=recorder.stop, daemon=True)
+        finisher.start()
+        self.root.after(200, self._poll_recording_end, recorder, finisher)
+
+    def _poll_recording_end(self, recorder, finisher):
+        if finisher.is_alive():
+            self.root.after(200, self._poll_recording_end, recorder, finisher)
+            return
+        st = recorder.stats()
+        self._update_status(f"Gravação encerrada: {st['gravados']} quadros em {st['segmentos']} arquivo(s), "
+                            f"{st['descartados']} descartados.")
+
+    def _poll_recording(self):
+        recorder = self.recorder
+        if recorder is None:
+            return
+        if recorder.error:
+            self.stop_recording()
+            messagebox.showerror("Erro", f"Gravação interrompida: {recorder.error}")
+            return
+        self.root.after(500, self._poll_recording)
+
+    def configure_recording(self):
+        cfg = self.recording_config
+        codec = simpledialog.askstring("Gravação", "Codec (FourCC, ex.: mp4v, XVID, MJPG):",
+                                       initialvalue=cfg["codec"], parent=self.root)
+        if codec is None:
+            return
+        fps = simpledialog.askfloat("Gravação", "Quadros por segundo (0 = da fonte):",
+                                    initialvalue=cfg["fps"] or 0, minvalue=0, parent=self.root)
+        if fps is None:
+            return
+        scale = simpledialog.askfloat("Gravação", "Escala (1 = resolução original):",
+                                      initialvalue=cfg["scale"], minvalue=0.05, maxvalue=1.0,
+                                      parent=self.root)
+        if scale is None:
+            return
+        segment_mb = simpledialog.askinteger("Gravação", "Novo arquivo a cada N MB (0 = nunca):",
+                                             initialvalue=cfg["segment_mb"], minvalue=0, parent=self.root)
+        if segment_mb is None:
+            return
+        segment_minutes = simpledialog.askinteger("Gravação", "Novo arquivo a cada N minutos (0 = nunca):",
+                                                  initialvalue=cfg["segment_minutes"], minvalue=0,
+                                                  parent=self.root)
+        if segment_minutes is None:
+            return
+        if len(codec.strip()) != 4:
+            messagebox.showerror("Erro", "O codec deve ter 4 caracteres.")
+            return
+        self.recording_config = {"codec": codec.strip(), "fps": fps or None, "scale": scale,
+                                 "segment_mb": segment_mb, "segment_minutes": segment_minutes}
+        self._update_status("Configuração de gravação atualizada (vale na próxima gravação).")
+
     def _get_current_processed_image(self):
         source = None
         if self.video_running:
             with self.lock:
                 source = self.video_frame.copy() if self.video_frame is not None else None
         elif self.running:
-            with self.lock:
-                source = self.frame.copy() if self.frame is not None else None
+            source = self.frame
         else:
             source = self.image_bgr.copy() if self.image_bgr is not None else None
 
         if source is None:
             return None
-        return self.filtros._apply_filters(self, source)
+        with self.process_lock:
+            key = ("filtros", image_key(source), self.filtros._chain_key)
+            return self.cache.get_or_compute(key, lambda: self.filtros._apply_filters(self, source))
+
+    # ---------- Pipeline de quadros ----------
+    def _process_frame(self, source):
+        """Estágio de processamento (roda fora da thread do Tk)."""
+        prof = self.profiler
+        with self.process_lock, prof.time("processamento"):
+            vp = self.video_processor
+            hud = prof.enabled and prof.hud
+            key = None
+            if source is self.image_bgr and not hud:
+                # Imagem estática: mesmo conteúdo, cadeia e estado → mesmo resultado
+                key = ("quadro", image_key(source), self.filtros._chain_key, vp.state_key())
+                cached = self.cache.get(key)
+                if cached is not None:
+                    return cached
+            with prof.time("filtros"):
+                frame = self.filtros._filter_frame(source)
+            with prof.time("tracker"):
+                vp.update_tracker(frame)
+            with prof.time("deteccao"):
+                vp.detect_purple_bottle(frame)
+            with prof.time("template"):
+                vp.detect_template(frame)
+            if hud:
+                prof.draw_hud(frame.canvas)
+            rgb = frame.rgb()
+            recorder = self.recorder
+            if recorder is not None and source is not self.image_bgr:
+                recorder.submit(rgb)
+                prof.gauge("gravacao_fila", recorder.pending)
+            if key is not None and vp.state_key() == key[3]:
+                self.cache.put(key, rgb)
+            return rgb
+
+    def _has_source(self):
+        # Vídeo carregado e parado conta: a prévia do primeiro quadro fica na tela
+        return (self.running or self.video_running or self.video_source is not None
+                or self.image_bgr is not None)
+
+    def _submit_static(self):
+        # Imagem estática só é reprocessada quando algo muda
+        if not self.running and not self.video_running and self.image_bgr is not None:
+            self.frame_pipeline.submit(self.image_bgr)
+
+    def show_pipeline_stats(self):
+        lines = []
+        stats = self.frame_pipeline.stats()
+        camera = self.camera
+        if camera is not None:
+            stats = dict({"camera": {"capturados": camera.captured, "descartados": camera.dropped}},
+                         **stats)
+        for stage, values in stats.items():
+            desc = ", ".join(f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}"
+                             for k, v in values.items())
+            lines.append(f"{stage}: {desc}")
+        recorder = self.recorder
+        if recorder is not None:
+            st = recorder.stats()
+            lines.append(f"gravacao: gravados={st['gravados']}, descartados={st['descartados']}, "
+                         f"repetidos={st['repetidos']}, fila={st['fila']}, segmentos={st['segmentos']}")
+        cache = self.cache.stats()
+        lines.append(f"cache: {cache['itens']} itens, {cache['MB']:.1f} MB, "
+                     f"acertos={cache['acertos']}, faltas={cache['faltas']}")
+        messagebox.showinfo("Desempenho do pipeline", "\n".join(lines))
 
     def _refresh_canvas(self):
-        img_rgb = self._get_current_processed_image()
-        if img_rgb is not None:
-            bgr = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2BGR)
-            bgr = self.video_processor.update_tracker(bgr)
-            bgr = self.video_processor.detect_purple_bottle(bgr)
-            bgr = self.video_processor.detect_template(bgr)
-            img_rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
-
-            canvas_w = self.canvas.winfo_width()
-            canvas_h = self.canvas.winfo_height()
-            h, w = img_rgb.shape[:2]
-            scale = min(canvas_w / w, canvas_h / h)
-            resized = cv2.resize(img_rgb, (int(w * scale), int(h * scale)))
-
-            img_pil = Image.fromarray(resized)
-            img_tk = ImageTk.PhotoImage(img_pil)
-            if self.canvas_image_id is None:
-                cx, cy = canvas_w // 2, canvas_h // 2
-                self.canvas_image_id = self.canvas.create_image(cx, cy, image=img_tk, anchor=tk.CENTER)
+        # Sem quadro novo e sem redimensionamento não há o que desenhar
+        try:
+            if self.tiled is not None:
+                self._apply_viewport()
+            img_rgb = self.frame_pipeline.latest()
+            if self._has_source() or img_rgb is not None:
+                with self.profiler.time("exibicao"):
+                    shown = self.display.show(img_rgb)
+                if shown:
+                    self.frame_pipeline.mark_displayed()
             else:
-                self.canvas.itemconfig(self.canvas_image_id, image=img_tk)
-            self.canvas.image = img_tk
+                self.display.clear()
+            if self.profiler.enabled:
+                self._update_profiler_status()
+        finally:
+            # Um erro num tick não pode parar a atualização da tela
+            self.root.after(50, self._refresh_canvas)
+
+    # ---------- Instrumentação ----------
+    def toggle_profiling(self):
+        enabled = self.var_profiling.get()
+        if enabled:
+            self.profiler.reset()
+        self.profiler.enabled = enabled
+        self.profiler.tracing = enabled
+        self._submit_static()
+        self._update_status("Instrumentação " + ("ativada." if enabled else "desativada."))
+
+    def toggle_hud(self):
+        self.profiler.hud = self.var_hud.get()
+        if self.profiler.hud and not self.var_profiling.get():
+            self.var_profiling.set(True)
+            self.toggle_profiling()
         else:
-            self.canvas.delete("all")
-            w = self.canvas.winfo_width() or 400
-            h = self.canvas.winfo_height() or 300
-            self.canvas.create_text(w//2, h//2, text="Carregue uma imagem ou inicie a câmera", fill="#ddd")
-            self.canvas_image_id = None
+            self._submit_static()
 
-        self.root.after(50, self._refresh_canvas)
+    def _update_profiler_status(self):
+        now = time.monotonic()
+        if now - self._last_status < 1.0:
+            return
+        self._last_status = now
+        prof = self.profiler
+        prof.gauge("captura_fps", round(self.frame_pipeline.capture_stats.fps(), 1))
+        prof.gauge("fila_entrada", self.frame_pipeline.input.depth())
+        prof.gauge("descartados", self.frame_pipeline.input.dropped + self.frame_pipeline.output.dropped)
+        if self.camera is not None:
+            prof.gauge("camera_descartados", self.camera.dropped)
+        self.status_var.set(prof.status_line())
+
+    def export_trace(self):
+        if not self.profiler.trace:
+            messagebox.showinfo("Info", "Ative a instrumentação para gravar o trace.")
+            return
+        path = filedialog.asksaveasfilename(
+            title="Exportar trace",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON", "*.json")]
+        )
+        if not path:
+            return
+        count = self.profiler.export(path)
+        self._update_status(f"Trace com {count} medições salvo em: {path}")
+
+    # ---------- Cadeia de filtros ----------
+    def add_filter_to_chain(self):
+        effect = self.effect_var.get()
+        if effect != "Nenhum":
+            self.filter_chain.append(effect)
+        self._on_filters_changed()
+
+    def clear_filter_chain(self):
+        self.filter_chain = []
+        self._on_filters_changed()
+
+    def _on_filters_changed(self):
+        # Com cadeia montada ela prevalece; senão vale o efeito selecionado
+        names = self.filter_chain or [self.effect_var.get()]
+        try:
+            # Mesmo lock do processamento: chave da cadeia e pipeline trocam juntas
+            with self.process_lock:
+                self.filtros.set_chain(names)
+        except ValueError as e:
+            messagebox.showerror("Erro", str(e))
+            return
+        self.chain_var.set("Cadeia: " + (" → ".join(self.filter_chain) or "-"))
+        self._submit_static()
+        self._update_status()
 
     def _update_status(self, text=None):
         if text:
@@ -311,6 +817,12 @@ class App:
             self.status_var.set(f"Efeito: {self.effect_var.get()} | Análise: {self.analysis_var.get()}")
 
     def on_close(self):
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.stop()
+        self.analisador.stream.stop()
+        self.frame_pipeline.stop()
+        self.video_processor.close_tracks()
         self.stop_camera()
         self.stop_video()
         self.root.destroy()
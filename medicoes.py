@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import deque
+
+from componentes import ConnectedComponents
+from geometria import ShapeMetrics
+
+
+class Measurer:
+    """Calcula área, perímetro, diâmetro e contagem de uma imagem binária."""
+
+    def __init__(self):
+        self.componentes = ConnectedComponents("auto")
+        self.metricas = ShapeMetrics()
+
+    def measure(self, binary):
+        count, _, _ = self.componentes.label(binary)
+        m = self.metricas.measure(binary)
+        return {
+            "area": m["pixel_area"],
+            "perimeter": m["perimeter"],
+            "diameter": float(m["diameter"]),
+            "count": int(count),
+        }
+
+
+class StreamingAnalyzer:
+    """Mede cada quadro recebido numa thread de fundo.
+
+    `submit` só guarda a referência do quadro mais recente: se o worker
+    ainda estiver ocupado, o quadro pendente é substituído (e contado como
+    descartado) em vez de enfileirado. Os resultados vão para um buffer
+    circular de medições com timestamp, lido pela interface com `latest`
+    ou `snapshot`.
+    """
+
+    def __init__(self, binarize, capacity=512):
+        self.binarize = binarize
+        self.measurer = Measurer()
+        self.results = deque(maxlen=capacity)
+        self.processed = 0
+        self.dropped = 0
+        self._pending = None
+        self._cond = threading.Condition()
+        self._running = False
+        self._worker_active = False
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            if self._worker_active:
+                # stop() anterior ainda não viu o worker sair (join expirou): reaproveita
+                self._cond.notify_all()
+                return
+            self._worker_active = True
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            pending, self._pending = self._pending, None
+            self._cond.notify_all()
+        if pending is not None and pending[2] is not None:
+            pending[2]()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def submit(self, frame, timestamp=None, release=None):
+        """`release` é chamado quando o quadro deixa de ser usado."""
+        if not self._running or frame is None:
+            if release is not None:
+                release()
+            return
+        with self._cond:
+            replaced = self._pending
+            if replaced is not None:
+                self.dropped += 1
+            self._pending = (frame, time.time() if timestamp is None else timestamp, release)
+            self._cond.notify()
+        if replaced is not None and replaced[2] is not None:
+            replaced[2]()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while self._running and self._pending is None:
+                    self._cond.wait()
+                if not self._running:
+                    # Decidido sob o lock: start() sabe se ainda há worker
+                    self._worker_active = False
+                    return
+                frame, ts, release = self._pending
+                self._pending = None
+
+            start = time.perf_counter()
+            try:
+                m = self.measurer.measure(self.binarize(frame))
+            except Exception as e:
+                print("Erro na análise contínua:", e)
+                continue
+            finally:
+                if release is not None:
+                    release()
+            m["timestamp"] = ts
+            m["latency"] = time.perf_counter() - start
+            with self._cond:
+                self.results.append(m)
+                self.processed += 1
+
+    def latest(self):
+        with self._cond:
+            return self.results[-1] if self.results else None
+
+    def snapshot(self):
+        with self._cond:
+            return list(self.results)
@@ -0,0 +1,383 @@
+"""Imagens muito grandes em blocos, sem carregar tudo na memória.
+
+A imagem fica num arquivo mapeado em memória (.npy ou bruto); blocos
+decodificados ficam num cache LRU, filtros rodam bloco a bloco com uma
+borda extra (halo) que mantém as junções idênticas ao processamento da
+imagem inteira, e a tela só lê a região visível, numa escala reduzida
+quando o zoom é pequeno.
+"""
+import math
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from cache import ResultCache
+from filtros import Binarizer, FilterPipeline, filtros
+
+RAW_EXTS = (".raw", ".bin")
+
+# Raio de vizinhança de cada filtro (pixels de halo necessários)
+HALO = {
+    "Suavização (Média)": lambda p: p["blur_ksize"] // 2,
+    "Suavização (Mediana)": lambda p: p["median_ksize"] // 2,
+    # Sobel 3x3 + supressão de não máximos; a histerese não é local
+    "Detector de Bordas (Canny)": lambda p: 2,
+    "Erosão": lambda p: p["kernel_size"] // 2,
+    "Dilatação": lambda p: p["kernel_size"] // 2,
+    "Abertura": lambda p: 2 * (p["kernel_size"] // 2),
+    "Fechamento": lambda p: 2 * (p["kernel_size"] // 2),
+}
+MORPHOLOGY = ("Erosão", "Dilatação", "Abertura", "Fechamento")
+
+
+def otsu_threshold(hist):
+    """Limiar de Otsu de um histograma de 256 posições (mesmo critério do OpenCV)."""
+    hist = np.asarray(hist, np.float64).ravel()
+    total = hist.sum()
+    if total == 0:
+        return 0
+    p = hist / total
+    levels = np.arange(256, dtype=np.float64)
+    w0 = np.cumsum(p)
+    mu0_sum = np.cumsum(p * levels)
+    mu = mu0_sum[-1]
+    w1 = 1.0 - w0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma = (mu * w0 - mu0_sum) ** 2 / (w0 * w1)
+    sigma[(w0 < np.finfo(float).eps) | (w1 < np.finfo(float).eps)] = -1
+    return int(np.argmax(sigma))
+
+
+class TiledImage:
+    """Imagem (H, W[, C]) lida por blocos de `tile` x `tile` pixels.
+
+    `data` é normalmente um np.memmap; `read` devolve só a região pedida
+    (mais o halo onde há vizinhos) e `tile_data` guarda os blocos já lidos
+    num cache LRU limitado em bytes. `level(k)` é a imagem reduzida 2**k
+    vezes, montada bloco a bloco na primeira vez que é pedida.
+    """
+
+    def __init__(self, data, tile=1024, cache_bytes=256 * 1024 * 1024, path=None):
+        self.data = data
+        self.tile = tile
+        self.path = path
+        self.cache = ResultCache(cache_bytes)
+        self._levels = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path, shape=None, dtype=np.uint8, tile=1024, cache_dir=None):
+        """Abre .npy ou bruto (.raw/.bin com `shape`) sem copiar para a RAM.
+
+        Outros formatos são decodificados uma vez pelo OpenCV e gravados
+        como .npy em `cache_dir`; as aberturas seguintes usam o mapeamento.
+        """
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".npy":
+            return cls(np.load(path, mmap_mode="r"), tile, path=path)
+        if ext in RAW_EXTS:
+            if shape is None:
+                raise ValueError("Arquivo bruto precisa do formato (altura, largura[, canais]).")
+            return cls(np.memmap(path, dtype=dtype, mode="r", shape=tuple(shape)), tile, path=path)
+
+        cache_dir = cache_dir or tempfile.gettempdir()
+        st = os.stat(path)
+        base = os.path.splitext(os.path.basename(path))[0]
+        npy = os.path.join(cache_dir, f"{base}_{st.st_size}_{int(st.st_mtime)}.npy")
+        if not os.path.exists(npy):
+            img = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+            if img is None:
+                raise RuntimeError(f"Não foi possível carregar a imagem: {path}")
+            if img.ndim == 3 and img.shape[2] == 4:
+                img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+            out = np.lib.format.open_memmap(npy + ".tmp", mode="w+", dtype=img.dtype, shape=img.shape)
+            out[:] = img
+            out.flush()
+            del out, img
+            os.replace(npy + ".tmp", npy)
+        return cls(np.load(npy, mmap_mode="r"), tile, path=path)
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def height(self):
+        return self.data.shape[0]
+
+    @property
+    def width(self):
+        return self.data.shape[1]
+
+    @property
+    def megapixels(self):
+        return self.height * self.width / 1e6
+
+    def tiles(self):
+        """Gera (ty, tx, y0, y1, x0, x1) de cada bloco, em ordem de varredura."""
+        t = self.tile
+        for ty, y0 in enumerate(range(0, self.height, t)):
+            for tx, x0 in enumerate(range(0, self.width, t)):
+                yield ty, tx, y0, min(y0 + t, self.height), x0, min(x0 + t, self.width)
+
+    def read(self, y0, y1, x0, x1, halo=0):
+        """Região [y0:y1, x0:x1] com até `halo` pixels de vizinhança.
+
+        Nas bordas da imagem o halo é omitido (o filtro aplica a própria
+        borda, como faria na imagem inteira). Retorna (bloco, (top, left)),
+        com o deslocamento da região pedida dentro do bloco.
+        """
+        ry0, rx0 = max(0, y0 - halo), max(0, x0 - halo)
+        ry1, rx1 = min(self.height, y1 + halo), min(self.width, x1 + halo)
+        return np.ascontiguousarray(self.data[ry0:ry1, rx0:rx1]), (y0 - ry0, x0 - rx0)
+
+    def tile_data(self, ty, tx):
+        key = (ty, tx)
+        block = self.cache.get(key)
+        if block is None:
+            t = self.tile
+            block, _ = self.read(ty * t, min((ty + 1) * t, self.height),
+                                 tx * t, min((tx + 1) * t, self.width))
+            self.cache.put(key, block)
+        return block
+
+    def region(self, y0, y1, x0, x1):
+        """Região montada a partir dos blocos em cache (pan/zoom relê pouco do disco)."""
+        t = self.tile
+        out = np.empty((y1 - y0, x1 - x0) + self.shape[2:], self.data.dtype)
+        for ty in range(y0 // t, (y1 - 1) // t + 1):
+            for tx in range(x0 // t, (x1 - 1) // t + 1):
+                block = self.tile_data(ty, tx)
+                by0, bx0 = ty * t, tx * t
+                sy0, sy1 = max(y0, by0), min(y1, by0 + block.shape[0])
+                sx0, sx1 = max(x0, bx0), min(x1, bx0 + block.shape[1])
+                out[sy0 - y0:sy1 - y0, sx0 - x0:sx1 - x0] = block[sy0 - by0:sy1 - by0, sx0 - bx0:sx1 - bx0]
+        return out
+
+    def level(self, k):
+        """Imagem reduzida por 2**k (INTER_AREA), montada bloco a bloco."""
+        if k <= 0:
+            return self.data
+        with self._lock:
+            img = self._levels.get(k)
+            if img is not None:
+                return img
+            f = 2 ** k
+            h, w = math.ceil(self.height / f), math.ceil(self.width / f)
+            img = np.empty((h, w) + self.shape[2:], self.data.dtype)
+            # Blocos múltiplos de 2**k: cada um vira um pedaço exato da redução
+            step = max(self.tile // f, 1) * f
+            for y0 in range(0, self.height, step):
+                for x0 in range(0, self.width, step):
+                    block, _ = self.read(y0, min(y0 + step, self.height), x0, min(x0 + step, self.width))
+                    oh, ow = math.ceil(block.shape[0] / f), math.ceil(block.shape[1] / f)
+                    img[y0 // f:y0 // f + oh, x0 // f:x0 // f + ow] = cv2.resize(
+                        block, (ow, oh), interpolation=cv2.INTER_AREA).reshape((oh, ow) + self.shape[2:])
+            self._levels[k] = img
+            return img
+
+    def overview(self, max_side=2048):
+        k = max(0, math.ceil(math.log2(max(self.height, self.width) / max_side)))
+        return self.level(k)
+
+    def viewport(self, x, y, w, h, out_w, out_h):
+        """Região (x, y, w, h) da imagem redimensionada para (out_w, out_h).
+
+        Lê do nível reduzido mais próximo da escala pedida, então só os
+        pixels necessários à tela são tocados.
+        """
+        x, y = max(0, int(x)), max(0, int(y))
+        w, h = max(1, min(int(w), self.width - x)), max(1, min(int(h), self.height - y))
+        ratio = min(w / max(out_w, 1), h / max(out_h, 1))
+        k = max(0, int(math.floor(math.log2(ratio)))) if ratio > 1 else 0
+        if k == 0:
+            region = self.region(y, y + h, x, x + w)
+        else:
+            f = 2 ** k
+            region = np.ascontiguousarray(
+                self.level(k)[y // f:(y + h + f - 1) // f, x // f:(x + w + f - 1) // f])
+        interp = cv2.INTER_AREA if region.shape[1] > out_w else cv2.INTER_LINEAR
+        return cv2.resize(region, (max(1, out_w), max(1, out_h)), interpolation=interp)
+
+    def gray_histogram(self):
+        hist = np.zeros(256, np.float64)
+        for _, _, y0, y1, x0, x1 in self.tiles():
+            block, _ = self.read(y0, y1, x0, x1)
+            gray = cv2.cvtColor(block, cv2.COLOR_BGR2GRAY) if block.ndim == 3 else block
+            hist += cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+        return hist
+
+
+def chain_halo(names, params, binarizer=None):
+    """Halo (pixels) que torna a cadeia exata nas junções dos blocos."""
+    p = dict(FilterPipeline.DEFAULTS, **(params or {}))
+    halo = sum(HALO[n](p) for n in names if n in HALO)
+    if binarizer is not None and binarizer.mode in ("media", "gaussiano") \
+            and any(n in MORPHOLOGY for n in names):
+        halo += binarizer.block_size // 2
+    return halo
+
+
+class TiledProcessor:
+    """Aplica uma cadeia de filtros bloco a bloco, gravando num .npy mapeado.
+
+    Cada thread usa a sua FilterPipeline (os buffers não são
+    compartilhados); o OpenCV libera o GIL, então os blocos rodam em
+    paralelo. O Otsu, que é global, tem o limiar calculado antes pelo
+    histograma da imagem inteira; um binarizador Otsu vira limiar fixo.
+    """
+
+    def __init__(self, names, params=None, binarizer=None, kernels=None, workers=4):
+        self.names = tuple(n for n in names if n and n != "Nenhum")
+        self.params = dict(params or {})
+        self.binarizer = binarizer or Binarizer()
+        self.kernels = kernels or filtros()._get_kernel
+        self.workers = workers
+        self._local = threading.local()
+
+    def _prefix_histogram(self, image, names):
+        """Histograma do cinza que chega ao passo após `names` (uma passada em blocos)."""
+        if not names:
+            return image.gray_histogram()
+        pipeline = FilterPipeline(names, self.params, self.kernels, binarizer=self.binarizer)
+        halo = chain_halo(names, self.params, self.binarizer)
+        hist = np.zeros(256, np.float64)
+        for _, _, y0, y1, x0, x1 in image.tiles():
+            block, (top, left) = image.read(y0, y1, x0, x1, halo)
+            if block.ndim == 2:
+                block = cv2.cvtColor(block, cv2.COLOR_GRAY2BGR)
+            res = pipeline.run_native(block)[top:top + (y1 - y0), left:left + (x1 - x0)]
+            gray = cv2.cvtColor(res, cv2.COLOR_BGR2GRAY) if res.ndim == 3 else res
+            hist += cv2.calcHist([np.ascontiguousarray(gray)], [0], None, [256], [0, 256]).ravel()
+        return hist
+
+    def _resolve_global(self, image):
+        """Troca os limiares de Otsu (globais) por limiares fixos equivalentes."""
+        if "Otsu" in self.names and self.params.get("otsu_threshold") is None:
+            prefix = self.names[:self.names.index("Otsu")]
+            self.params["otsu_threshold"] = otsu_threshold(self._prefix_histogram(image, prefix))
+        if self.binarizer.mode == "otsu":
+            first = next((i for i, n in enumerate(self.names) if n in MORPHOLOGY), None)
+            if first is not None:
+                t = otsu_threshold(self._prefix_histogram(image, self.names[:first]))
+                self.binarizer = Binarizer("fixo", t)
+
+    def _pipeline(self):
+        p = getattr(self._local, "pipeline", None)
+        if p is None:
+            p = self._local.pipeline = FilterPipeline(self.names, self.params, self.kernels,
+                                                      binarizer=self.binarizer)
+        return p
+
+    def run(self, image, out_path=None, progress=None):
+        """Processa `image` (TiledImage) e retorna o resultado como TiledImage."""
+        self._resolve_global(image)
+        halo = chain_halo(self.names, self.params, self.binarizer)
+        tiles = list(image.tiles())
+        probe = FilterPipeline(self.names, self.params, self.kernels, binarizer=self.binarizer)
+        shape = image.shape[:2] if probe.output_kind != "bgr" else image.shape[:2] + (3,)
+        if out_path is None:
+            fd, out_path = tempfile.mkstemp(suffix=".npy")
+            os.close(fd)
+        out = np.lib.format.open_memmap(out_path, mode="w+", dtype=np.uint8, shape=shape)
+
+        def work(t):
+            _, _, y0, y1, x0, x1 = t
+            block, (top, left) = image.read(y0, y1, x0, x1, halo)
+            if block.ndim == 2:
+                block = cv2.cvtColor(block, cv2.COLOR_GRAY2BGR)
+            res = self._pipeline().run_native(block)
+            out[y0:y1, x0:x1] = res[top:top + (y1 - y0), left:left + (x1 - x0)]
+
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for _ in pool.map(work, tiles):
+                done += 1
+                if progress is not None:
+                    progress(done, len(tiles))
+        out.flush()
+        del out
+        return TiledImage(np.load(out_path, mmap_mode="r"), image.tile, path=out_path)
+
+
+class _UnionFind:
+    def __init__(self, n):
+        self.parent = np.arange(n + 1)
+
+    def find(self, a):
+        parent = self.parent
+        root = a
+        while parent[root] != root:
+            root = parent[root]
+        while parent[a] != root:
+            parent[a], a = root, parent[a]
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return False
+        self.parent[max(ra, rb)] = min(ra, rb)
+        return True
+
+
+def tiled_binary_stats(image, binarizer, binary=False, workers=4):
+    """Área (pixels brancos) e número de objetos (vizinhança 8) em blocos.
+
+    Cada bloco é binarizado e rotulado sozinho; os rótulos ganham um
+    deslocamento global e só as linhas/colunas das junções são guardadas.
+    Objetos que cruzam junções são unidos por union-find comparando cada
+    pixel da junção com os três vizinhos do outro lado (inclui diagonais
+    e cantos). Com `binary=True` a imagem já é binária.
+    """
+    if not binary and binarizer.mode == "otsu":
+        binarizer = Binarizer("fixo", otsu_threshold(image.gray_histogram()))
+    halo = 0 if binary or binarizer.mode not in ("media", "gaussiano") else binarizer.block_size // 2
+    tiles = list(image.tiles())
+
+    def work(t):
+        _, _, y0, y1, x0, x1 = t
+        block, (top, left) = image.read(y0, y1, x0, x1, halo)
+        if block.ndim == 3:
+            block = cv2.cvtColor(block, cv2.COLOR_BGR2GRAY)
+        b = block if binary else binarizer.apply(block)
+        b = b[top:top + (y1 - y0), left:left + (x1 - x0)]
+        n, labels = cv2.connectedComponents(b, connectivity=8, ltype=cv2.CV_32S)
+        edges = (labels[0].copy(), labels[-1].copy(), labels[:, 0].copy(), labels[:, -1].copy())
+        return t, cv2.countNonZero(b), n - 1, edges
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(work, tiles))
+
+    H, W = image.height, image.width
+    rows = {}   # y da junção -> (linha acima, linha abaixo) com rótulos globais
+    cols = {}
+    area = 0
+    offset = 0
+    for (_, _, y0, y1, x0, x1), a, n, (top, bottom, left, right) in results:
+        area += a
+        shift = lambda e: np.where(e > 0, e + offset, 0)
+        if y0 > 0:
+            rows.setdefault(y0, [np.zeros(W, np.int64), np.zeros(W, np.int64)])[1][x0:x1] = shift(top)
+        if y1 < H:
+            rows.setdefault(y1, [np.zeros(W, np.int64), np.zeros(W, np.int64)])[0][x0:x1] = shift(bottom)
+        if x0 > 0:
+            cols.setdefault(x0, [np.zeros(H, np.int64), np.zeros(H, np.int64)])[1][y0:y1] = shift(left)
+        if x1 < W:
+            cols.setdefault(x1, [np.zeros(H, np.int64), np.zeros(H, np.int64)])[0][y0:y1] = shift(right)
+        offset += n
+
+    uf = _UnionFind(offset)
+    merged = 0
+    for before, after in list(rows.values()) + list(cols.values()):
+        for d in (-1, 0, 1):
+            a = before[max(0, -d):len(before) - max(0, d)]
+            b = after[max(0, d):len(after) - max(0, -d)]
+            pairs = np.unique(np.stack([a, b], axis=1)[(a > 0) & (b > 0)], axis=0)
+            for la, lb in pairs:
+                merged += uf.union(int(la), int(lb))
+    return {"area": int(area), "count": offset - merged, "tiles": len(tiles)}
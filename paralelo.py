@@ -0,0 +1,136 @@
+import multiprocessing as mp
+import os
+import time
+from collections import deque
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+# Estado de cada processo do pool (criado no initializer)
+_state = {}
+
+
+def _init_worker(config, stateless):
+    import cv2
+    from lote import BatchProcessor
+    # Um thread do OpenCV por processo evita disputa entre os workers
+    cv2.setNumThreads(1)
+    proc = BatchProcessor(**config)
+    search = proc.video_processor.template_search
+    if stateless and search is not None:
+        # Quadros chegam fora de sequência: sem atalhos temporais
+        search.max_misses = 1
+    _state["config"] = config
+    _state["proc"] = proc
+    _state["shm"] = {}
+
+
+def _attach(name):
+    shm = _state["shm"].get(name)
+    if shm is None:
+        shm = shared_memory.SharedMemory(name=name)
+        _state["shm"][name] = shm
+    return shm
+
+
+def _process_frame(task):
+    index, name, shape = task
+    buf = np.ndarray(shape, dtype=np.uint8, buffer=_attach(name).buf)
+    start = time.perf_counter()
+    out, row = _state["proc"].process(buf)
+    # O resultado volta pelo mesmo bloco de memória compartilhada
+    if out is not buf:
+        np.copyto(buf, out)
+    return index, row, os.getpid(), time.perf_counter() - start
+
+
+def _process_stream(task):
+    from lote import BatchProcessor, run_source
+    source, output_dir, codec, root = task
+    start = time.perf_counter()
+    proc = BatchProcessor(**_state["config"])
+    rows = run_source(proc, source, output_dir, codec, root=root)
+    return source, rows, os.getpid(), time.perf_counter() - start
+
+
+class ParallelExecutor:
+    """Distribui quadros ou arquivos por um pool de processos.
+
+    - `map_frames` fatia uma sequência de quadros independentes entre os
+      workers. Cada quadro vai por um bloco de SharedMemory (um memcpy,
+      sem pickle do array) e o resultado anotado volta no mesmo bloco; a
+      saída sai na ordem de entrada e o número de blocos limita quantos
+      quadros ficam em voo.
+    - `map_streams` manda cada vídeo inteiro para um único worker, para
+      que trackers e buscas temporais mantenham estado no mesmo processo.
+    - `stats` informa quadros e quadros/s de cada worker.
+    """
+
+    def __init__(self, config, workers=None, slots_per_worker=2):
+        self.config = dict(config)
+        self.workers = workers or os.cpu_count() or 1
+        self.slots = self.workers * slots_per_worker
+        self.worker_stats = {}
+
+    def _record(self, pid, busy, frames=1):
+        st = self.worker_stats.setdefault(pid, {"frames": 0, "busy": 0.0})
+        st["frames"] += frames
+        st["busy"] += busy
+
+    def stats(self):
+        return {pid: {"frames": st["frames"],
+                      "fps": st["frames"] / st["busy"] if st["busy"] > 0 else 0.0}
+                for pid, st in self.worker_stats.items()}
+
+    def _pool(self, stateless):
+        # Workers herdam o resource tracker do pai; senão cada um criaria o
+        # seu e apagaria os blocos compartilhados ao terminar.
+        resource_tracker.ensure_running()
+        return mp.Pool(self.workers, initializer=_init_worker, initargs=(self.config, stateless))
+
+    def map_frames(self, frames):
+        """Recebe (meta, bgr) e gera (meta, bgr_anotado, resultados) na mesma ordem."""
+        free = []
+        allocated = []
+        pending = deque()
+        pool = self._pool(stateless=True)
+        try:
+            for index, (meta, bgr) in enumerate(frames):
+                if not free and len(allocated) >= self.slots:
+                    yield self._collect(pending, free)
+                bgr = np.ascontiguousarray(bgr, dtype=np.uint8)
+                shm = free.pop() if free else None
+                if shm is None or shm.size < bgr.nbytes:
+                    if shm is not None:
+                        allocated.remove(shm)
+                        shm.close()
+                        shm.unlink()
+                    shm = shared_memory.SharedMemory(create=True, size=bgr.nbytes)
+                    allocated.append(shm)
+                np.copyto(np.ndarray(bgr.shape, dtype=np.uint8, buffer=shm.buf), bgr)
+                result = pool.apply_async(_process_frame, ((index, shm.name, bgr.shape),))
+                pending.append((meta, bgr.shape, shm, result))
+            while pending:
+                yield self._collect(pending, free)
+        finally:
+            pool.close()
+            pool.join()
+            for shm in allocated:
+                shm.close()
+                shm.unlink()
+
+    def _collect(self, pending, free):
+        meta, shape, shm, result = pending.popleft()
+        _, row, pid, busy = result.get()
+        out = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf).copy()
+        self._record(pid, busy)
+        free.append(shm)
+        return meta, out, row
+
+    def map_streams(self, sources, output_dir=None, codec="mp4v", root=None):
+        """Processa cada fonte inteira num worker; gera (fonte, linhas) na ordem."""
+        with self._pool(stateless=False) as pool:
+            tasks = [(src, output_dir, codec, root) for src in sources]
+            for source, rows, pid, busy in pool.imap(_process_stream, tasks):
+                self._record(pid, busy, len(rows))
+                yield source, rows
@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import deque
+
+
+class LatestSlot:
+    """Fila limitada a um item em que o mais recente vence.
+
+    `put` substitui o item pendente (contando-o como descartado) em vez de
+    bloquear o produtor; itens com sequência mais antiga que a última já
+    publicada são ignorados, o que mantém a ordem com vários workers.
+    `release` (opcional) é chamado quando o item é descartado; quem tira o
+    item com `get` passa a ser responsável por chamá-lo.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._last_seq = -1
+        self.dropped = 0
+
+    def put(self, seq, payload, timestamp=None, release=None):
+        with self._cond:
+            accepted = seq > self._last_seq
+            if not accepted:
+                self.dropped += 1
+                dropped = release
+            else:
+                dropped = self._item[3] if self._item is not None else None
+                if self._item is not None:
+                    self.dropped += 1
+                self._last_seq = seq
+                ts = time.monotonic() if timestamp is None else timestamp
+                self._item = (seq, ts, payload, release)
+                self._cond.notify()
+        if dropped is not None:
+            dropped()
+        return accepted
+
+    def get(self, timeout=None):
+        with self._cond:
+            if self._item is None:
+                self._cond.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+    def depth(self):
+        return 0 if self._item is None else 1
+
+    def clear(self):
+        with self._cond:
+            item, self._item = self._item, None
+        if item is not None and item[3] is not None:
+            item[3]()
+
+
+class StageStats:
+    """Vazão (itens/s) numa janela deslizante e latência do último item."""
+
+    def __init__(self, window=2.0):
+        self.window = window
+        self.count = 0
+        self.latency = 0.0
+        self._times = deque()
+        self._lock = threading.Lock()
+
+    def tick(self, latency=0.0):
+        now = time.monotonic()
+        with self._lock:
+            self.count += 1
+            self.latency = latency
+            self._times.append(now)
+            while self._times and now - self._times[0] > self.window:
+                self._times.popleft()
+
+    def fps(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._times and now - self._times[0] > self.window:
+                self._times.popleft()
+            return len(self._times) / self.window
+
+
+class Stage:
+    """Estágio com N threads que consomem de um slot e publicam em outro."""
+
+    def __init__(self, name, func, source, sink, workers=1):
+        self.name = name
+        self.func = func
+        self.source = source
+        self.sink = sink
+        self.workers = workers
+        self.stats = StageStats()
+        self._running = False
+        self._threads = []
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._threads = [threading.Thread(target=self._loop, daemon=True, name=f"{self.name}-{i}")
+                         for i in range(self.workers)]
+        for t in self._threads:
+            t.start()
+
+    def stop(self):
+        self._running = False
+        for t in self._threads:
+            t.join(timeout=1.0)
+        self._threads = []
+
+    def _loop(self):
+        while self._running:
+            item = self.source.get(timeout=0.1)
+            if item is None:
+                continue
+            seq, ts, payload, release = item
+            start = time.perf_counter()
+            try:
+                result = self.func(payload)
+            except Exception as e:
+                print(f"Erro no estágio {self.name}:", e)
+                continue
+            finally:
+                if release is not None:
+                    release()
+            self.stats.tick(time.perf_counter() - start)
+            if result is not None:
+                self.sink.put(seq, result, ts)
+
+
+class FramePipeline:
+    """Captura → processamento → exibição com slots "último quadro vence".
+
+    As threads de captura chamam `submit`; os workers de processamento rodam
+    `process`; a interface só lê o resultado pronto com `latest` (sem
+    bloquear) e chama `mark_displayed` ao desenhar.
+    """
+
+    def __init__(self, process, workers=1):
+        self.input = LatestSlot()
+        self.output = LatestSlot()
+        self.capture_stats = StageStats()
+        self.display_stats = StageStats()
+        self.processing = Stage("processamento", process, self.input, self.output, workers)
+        self._seq = 0
+        self._seq_lock = threading.Lock()
+
+    def start(self):
+        self.processing.start()
+
+    def stop(self):
+        self.processing.stop()
+        self.input.clear()
+        self.output.clear()
+
+    def submit(self, frame, release=None):
+        if frame is None:
+            return
+        with self._seq_lock:
+            self._seq += 1
+            seq = self._seq
+        self.capture_stats.tick()
+        self.input.put(seq, frame, release=release)
+
+    def latest(self):
+        item = self.output.get(timeout=0)
+        return None if item is None else item[2]
+
+    def mark_displayed(self):
+        self.display_stats.tick()
+
+    def stats(self):
+        return {
+            "captura": {"fps": self.capture_stats.fps(), "descartados": self.input.dropped},
+            "processamento": {"fps": self.processing.stats.fps(),
+                              "latencia_ms": self.processing.stats.latency * 1000,
+                              "descartados": self.output.dropped},
+            "exibicao": {"fps": self.display_stats.fps()},
+        }
@@ -0,0 +1,109 @@
+import cv2
+
+
+class Frame:
+    """Quadro com um buffer canônico e espaços de cor derivados sob demanda.
+
+    `image` pode ser BGR ou cinza (saída dos filtros). Cada conversão
+    (BGR, cinza, HSV) é feita no máximo uma vez e compartilhada pelos
+    estágios; `binary(binarizer)` guarda uma binarização por configuração.
+    As anotações vão para `canvas`, uma cópia criada só quando
+    algo é desenhado, de modo que as detecções continuam lendo o quadro
+    limpo. Com `in_place=True` o desenho é feito no próprio buffer (uso
+    legado com ndarray).
+    """
+
+    def __init__(self, image, in_place=False):
+        self.image = image
+        self.in_place = in_place
+        self._bgr = None
+        self._gray = None
+        self._hsv = None
+        self._canvas = None
+        self._pyramid = None
+        self._binary = {}
+        self.conversions = 0
+
+    @classmethod
+    def wrap(cls, frame):
+        """Aceita um Frame ou um ndarray (anotado no próprio buffer)."""
+        if isinstance(frame, cls):
+            return frame
+        return cls(frame, in_place=True)
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    @property
+    def bgr(self):
+        if self._bgr is None:
+            if self.image.ndim == 2:
+                self._bgr = cv2.cvtColor(self.image, cv2.COLOR_GRAY2BGR)
+                self.conversions += 1
+            elif self.image.shape[2] == 4:
+                self._bgr = cv2.cvtColor(self.image, cv2.COLOR_BGRA2BGR)
+                self.conversions += 1
+            else:
+                self._bgr = self.image
+        return self._bgr
+
+    @property
+    def gray(self):
+        if self._gray is None:
+            if self.image.ndim == 2:
+                self._gray = self.image
+            else:
+                self._gray = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+                self.conversions += 1
+        return self._gray
+
+    @property
+    def hsv(self):
+        if self._hsv is None:
+            self._hsv = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2HSV)
+            self.conversions += 1
+        return self._hsv
+
+    def binary(self, binarizer):
+        """Imagem binária do cinza, calculada uma vez por quadro e configuração."""
+        key = binarizer.key
+        out = self._binary.get(key)
+        if out is None:
+            out = self._binary[key] = binarizer.apply(self.gray)
+            self.conversions += 1
+        return out
+
+    def pyramid(self, levels):
+        """Pirâmide gaussiana do cinza (reaproveitada entre estágios)."""
+        if self._pyramid is None or len(self._pyramid) < levels + 1:
+            pyr = [self.gray]
+            for _ in range(levels):
+                if min(pyr[-1].shape) < 2:
+                    break
+                pyr.append(cv2.pyrDown(pyr[-1]))
+            self._pyramid = pyr
+        return self._pyramid[:levels + 1]
+
+    @property
+    def canvas(self):
+        """Imagem BGR para desenho (copiada na primeira anotação)."""
+        if self._canvas is None:
+            if self.in_place:
+                self._canvas = self.bgr
+            else:
+                self._canvas = self.bgr.copy()
+        return self._canvas
+
+    @property
+    def annotated(self):
+        return self._canvas is not None
+
+    def output_bgr(self):
+        return self._canvas if self._canvas is not None else self.bgr
+
+    def rgb(self):
+        """RGB para exibição (anotações incluídas); uma conversão por chamada."""
+        if self._canvas is None and self.image.ndim == 2:
+            return cv2.cvtColor(self.image, cv2.COLOR_GRAY2RGB)
+        return cv2.cvtColor(self.output_bgr(), cv2.COLOR_BGR2RGB)
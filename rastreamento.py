@@ -0,0 +1,348 @@
+import itertools
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from geometria import bbox_iou
+
+
+class ScaledTracker:
+    """Roda um tracker num quadro reduzido e devolve bboxes em resolução cheia."""
+
+    def __init__(self, tracker, scale):
+        self.tracker = tracker
+        self.scale = scale
+
+    def _resize(self, frame):
+        return cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+
+    def init(self, frame, bbox):
+        s = self.scale
+        x, y, w, h = bbox
+        small = (int(x * s), int(y * s), max(1, int(w * s)), max(1, int(h * s)))
+        return self.tracker.init(self._resize(frame), small)
+
+    def update(self, frame):
+        ok, bbox = self.tracker.update(self._resize(frame))
+        if not ok or bbox is None:
+            return ok, bbox
+        inv = 1.0 / self.scale
+        return ok, tuple(int(round(v * inv)) for v in bbox)
+
+
+class TrackerRegistry:
+    """Registro dos backends de tracker do OpenCV disponíveis.
+
+    `PREFERENCE` vai do mais preciso ao menos preciso; `SPEED`, do mais
+    rápido ao mais lento (ordem típica, usada enquanto não há medições).
+    `benchmark` mede a latência de `update` de cada backend num quadro;
+    `select` escolhe o primeiro da ordem de preferência que cabe no fps
+    alvo (ou o mais rápido, se nenhum cabe) e `faster_than` indica para
+    qual trocar quando o atual ficar lento.
+    """
+
+    PREFERENCE = ("CSRT", "KCF", "MIL", "MedianFlow", "MOSSE")
+    SPEED = ("MOSSE", "MedianFlow", "KCF", "CSRT", "MIL")
+
+    def __init__(self):
+        self.latency_ms = {}
+
+    @staticmethod
+    def _factories(name):
+        found = []
+        for mod, prefix in ((cv2, ""), (getattr(cv2, "legacy", None), "legacy.")):
+            if mod is None:
+                continue
+            func = getattr(mod, f"Tracker{name}_create", None)
+            if func is not None:
+                found.append((func, f"{prefix}Tracker{name}_create"))
+            cls = getattr(mod, f"Tracker{name}", None)
+            if cls is not None and hasattr(cls, "create"):
+                found.append((cls.create, f"{prefix}Tracker{name}.create"))
+        return found
+
+    def available(self):
+        return [n for n in self.PREFERENCE if self._factories(n)]
+
+    def create(self, name=None, scale=1.0):
+        """Retorna (tracker, nome) ou (None, None)."""
+        names = [name] if name else self.available()
+        for n in names:
+            for func, label in self._factories(n):
+                try:
+                    tr = func()
+                except Exception as e:
+                    print(f"[TrackerRegistry] Falha ao criar {label}: {e}")
+                    continue
+                if tr is not None:
+                    if scale != 1.0:
+                        tr = ScaledTracker(tr, scale)
+                    return tr, n
+        return None, None
+
+    def benchmark(self, frame, bbox, steps=10, scale=1.0):
+        """Mede a latência média (ms) de update de cada backend disponível."""
+        H, W = frame.shape[:2]
+        results = {}
+        for name in self.available():
+            tr, _ = self.create(name, scale)
+            if tr is None:
+                continue
+            try:
+                if tr.init(frame, tuple(int(v) for v in bbox)) is False:
+                    continue
+                start = time.perf_counter()
+                for i in range(steps):
+                    # Quadros levemente deslocados simulam movimento
+                    shifted = np.roll(frame, (i % 5) - 2, axis=1) if W > 4 else frame
+                    tr.update(shifted)
+                results[name] = (time.perf_counter() - start) * 1000 / steps
+            except Exception as e:
+                print(f"[TrackerRegistry] Falha no benchmark de {name}: {e}")
+        self.latency_ms.update(results)
+        return results
+
+    def select(self, target_fps):
+        if not self.latency_ms:
+            available = self.available()
+            return available[0] if available else None
+        budget = 1000.0 / target_fps
+        for name in self.PREFERENCE:
+            if name in self.latency_ms and self.latency_ms[name] <= budget:
+                return name
+        return min(self.latency_ms, key=self.latency_ms.get)
+
+    def faster_than(self, name):
+        if self.latency_ms and name in self.latency_ms:
+            faster = [n for n, ms in self.latency_ms.items() if ms < self.latency_ms[name]]
+            return max(faster, key=self.latency_ms.get) if faster else None
+        # Sem medições: o backend disponível imediatamente mais rápido
+        if name not in self.SPEED:
+            return None
+        available = self.available()
+        faster = [n for n in self.SPEED[:self.SPEED.index(name)] if n in available]
+        return faster[-1] if faster else None
+
+
+class Track:
+    """Um objeto rastreado, com id estável durante toda a vida do track."""
+
+    def __init__(self, track_id, tracker, bbox, priority=0):
+        self.id = track_id
+        self.tracker = tracker
+        self.bbox = tuple(int(v) for v in bbox)
+        self.priority = priority
+        self.lost = 0
+        self.missed = 0
+        self.age = 0
+        self.last_update = None
+
+    @property
+    def centroid(self):
+        x, y, w, h = self.bbox
+        return x + w / 2.0, y + h / 2.0
+
+
+class TrackManager:
+    """Mantém vários tracks e associa detecções a eles.
+
+    - `update(frame, detections)` atualiza todos os trackers (em paralelo
+      numa ThreadPool, já que o OpenCV libera o GIL) e, se houver
+      detecções, associa cada uma ao track mais próximo por IoU ou por
+      distância entre centroides; detecções sem par viram tracks novos.
+    - `lost` conta falhas seguidas do tracker (zera a cada atualização
+      boa) e `missed`, rodadas de detecção seguidas sem par; o track sai
+      com `lost` > `max_lost` ou `missed` > `max_missed`. Alvos do usuário
+      não envelhecem por falta de detecção (o detector não os conhece).
+    - A prioridade de cada track vem de `priority(bbox)` (por padrão a área
+      da detecção, renovada a cada associação); alvos escolhidos pelo
+      usuário entram com `USER_PRIORITY` e não perdem a posição.
+    - Com a média móvel do tempo de atualização acima de `budget_ms` por
+      `patience` quadros seguidos, só os `full_rate_tracks` tracks de maior
+      prioridade seguem em todo quadro; os demais passam a ser atualizados
+      a cada `stride` quadros (o stride dobra até `max_stride` e só volta a
+      cair depois de `patience` quadros com folga).
+    - `close` encerra a ThreadPool; chame ao desligar o rastreamento.
+    """
+
+    USER_PRIORITY = float("inf")
+
+    def __init__(self, tracker_factory, match="iou", match_iou=0.3, max_distance=50.0,
+                 max_lost=10, max_tracks=16, workers=4, budget_ms=30.0,
+                 full_rate_tracks=2, max_stride=8, priority=None, patience=5, max_missed=3):
+        if match not in ("iou", "centroid"):
+            raise ValueError(f"Associação desconhecida: {match}")
+        self.tracker_factory = tracker_factory
+        self.match = match
+        self.match_iou = match_iou
+        self.max_distance = max_distance
+        self.max_lost = max_lost
+        self.max_missed = max_missed
+        self.max_tracks = max_tracks
+        self.budget_ms = budget_ms
+        self.full_rate_tracks = full_rate_tracks
+        self.max_stride = max_stride
+        self.priority = priority or (lambda bbox: float(bbox[2] * bbox[3]))
+        self.patience = patience
+        self.stride = 1
+        self.frame_index = 0
+        self.last_update_ms = 0.0
+        self.load_ms = 0.0
+        self._over = 0
+        self._under = 0
+        self.tracks = {}
+        self._ids = itertools.count(1)
+        self._pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    def close(self):
+        self.clear()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def clear(self):
+        self.tracks = {}
+        self.stride = 1
+        self.load_ms = 0.0
+        self._over = self._under = 0
+
+    def add(self, frame, bbox, priority=None):
+        if len(self.tracks) >= self.max_tracks:
+            return None
+        tracker = self.tracker_factory()
+        if tracker is None:
+            return None
+        try:
+            if tracker.init(frame, tuple(int(v) for v in bbox[:4])) is False:
+                return None
+        except Exception as e:
+            print("TrackManager: falha ao iniciar tracker:", e)
+            return None
+        if priority is None:
+            priority = self.priority(bbox)
+        track = Track(next(self._ids), tracker, bbox[:4], priority)
+        self.tracks[track.id] = track
+        return track
+
+    def _reinit(self, track, frame, bbox):
+        tracker = self.tracker_factory()
+        try:
+            if tracker is not None and tracker.init(frame, tuple(int(v) for v in bbox[:4])) is not False:
+                track.tracker = tracker
+                track.bbox = tuple(int(v) for v in bbox[:4])
+                track.last_update = self.frame_index
+        except Exception as e:
+            print("TrackManager: falha ao reiniciar tracker:", e)
+
+    def _due_tracks(self):
+        tracks = list(self.tracks.values())
+        if self.stride == 1:
+            return tracks
+        ranked = sorted(tracks, key=lambda t: t.priority, reverse=True)
+        full_rate = {t.id for t in ranked[:self.full_rate_tracks]}
+        return [t for t in tracks
+                if t.id in full_rate or (self.frame_index + t.id) % self.stride == 0]
+
+    def _adapt_stride(self):
+        # Média móvel + `patience` quadros seguidos: carga estável não faz o stride oscilar
+        self.load_ms = (self.last_update_ms if self.frame_index == 1
+                        else 0.8 * self.load_ms + 0.2 * self.last_update_ms)
+        self._over = self._over + 1 if self.load_ms > self.budget_ms else 0
+        self._under = self._under + 1 if self.load_ms < self.budget_ms / 2 else 0
+        if self._over >= self.patience and self.stride < self.max_stride:
+            self.stride = min(self.stride * 2, self.max_stride)
+            self._over = 0
+        elif self._under >= self.patience and self.stride > 1:
+            self.stride //= 2
+            self._under = 0
+
+    @staticmethod
+    def _step(track, frame):
+        try:
+            ok, bbox = track.tracker.update(frame)
+        except Exception:
+            ok, bbox = False, None
+        return track, ok, bbox
+
+    def update(self, frame, detections=None):
+        """Atualiza os tracks; retorna a lista de tracks ativos."""
+        self.frame_index += 1
+        start = time.perf_counter()
+
+        due = self._due_tracks()
+        if self._pool is not None and len(due) > 1:
+            results = list(self._pool.map(lambda t: self._step(t, frame), due))
+        else:
+            results = [self._step(t, frame) for t in due]
+
+        H, W = frame.shape[:2]
+        failed = set()
+        for track, ok, bbox in results:
+            track.age += 1
+            if ok and bbox is not None:
+                x, y, w, h = (int(v) for v in bbox)
+                if w > 5 and h > 5 and 0 <= x < W and 0 <= y < H:
+                    track.bbox = (x, y, w, h)
+                    track.last_update = self.frame_index
+                    track.lost = 0
+                    continue
+            track.lost += 1
+            failed.add(track.id)
+
+        if detections is not None:
+            self._associate(frame, detections, failed)
+
+        for tid in [tid for tid, t in self.tracks.items()
+                    if t.lost > self.max_lost or t.missed > self.max_missed]:
+            del self.tracks[tid]
+
+        self.last_update_ms = (time.perf_counter() - start) * 1000
+        self._adapt_stride()
+        return list(self.tracks.values())
+
+    def _score(self, track, det):
+        if self.match == "iou":
+            return bbox_iou(track.bbox, det)
+        tx, ty = track.centroid
+        dx, dy = det[0] + det[2] / 2.0 - tx, det[1] + det[3] / 2.0 - ty
+        dist = math.hypot(dx, dy)
+        return 1.0 - dist / self.max_distance if dist <= self.max_distance else 0.0
+
+    def _associate(self, frame, detections, failed=()):
+        # Associação gulosa pelos pares de maior afinidade
+        pairs = []
+        for tid, track in self.tracks.items():
+            for i, det in enumerate(detections):
+                score = self._score(track, det)
+                if score > 0:
+                    pairs.append((score, tid, i))
+        pairs.sort(reverse=True)
+
+        threshold = self.match_iou if self.match == "iou" else 0.0
+        matched_tracks, matched_dets = set(), set()
+        for score, tid, i in pairs:
+            if tid in matched_tracks or i in matched_dets or score < threshold:
+                continue
+            matched_tracks.add(tid)
+            matched_dets.add(i)
+            track = self.tracks[tid]
+            track.lost = 0
+            track.missed = 0
+            if track.priority != self.USER_PRIORITY:
+                track.priority = self.priority(detections[i])
+            if tid in failed:
+                # Tracker falhou neste quadro: reinicia na detecção
+                self._reinit(track, frame, detections[i])
+            elif track.last_update != self.frame_index:
+                # Pulado pelo stride (CPU curta): só corrige a caixa, sem recriar o tracker
+                track.bbox = tuple(int(v) for v in detections[i][:4])
+
+        for tid, track in self.tracks.items():
+            if tid not in matched_tracks and track.priority != self.USER_PRIORITY:
+                track.missed += 1
+        for i, det in enumerate(detections):
+            if i not in matched_dets:
+                self.add(frame, det)
@@ -0,0 +1,171 @@
+import cv2
+import numpy as np
+
+from geometria import bbox_iou
+
+
+class TemplateMatcher:
+    """Busca de template em pirâmide (grosso → fino), multiescala e top-k.
+
+    O template é convertido para cinza e reduzido uma única vez, para cada
+    escala, no carregamento. A cada quadro a busca completa só roda no nível
+    mais grosso da pirâmide; no nível original o matchTemplate é feito apenas
+    em janelas pequenas em volta dos candidatos. Os resultados passam por
+    supressão de não-máximos e vêm como (x, y, w, h, confianca, escala).
+    """
+
+    def __init__(self, template_bgr, scales=(1.0,), levels=2, top_k=1,
+                 threshold=0.8, coarse_slack=0.15, nms_iou=0.3, min_size=12):
+        if template_bgr.ndim == 3:
+            gray = cv2.cvtColor(template_bgr, cv2.COLOR_BGR2GRAY)
+        else:
+            gray = template_bgr
+        self.gray = gray
+        self.levels = levels
+        self.top_k = top_k
+        self.threshold = threshold
+        self.coarse_slack = coarse_slack
+        self.nms_iou = nms_iou
+        self.min_size = min_size
+        self.pyramids = {}
+        for s in scales:
+            t = gray if s == 1.0 else cv2.resize(
+                gray, None, fx=s, fy=s,
+                interpolation=cv2.INTER_AREA if s < 1.0 else cv2.INTER_LINEAR)
+            if min(t.shape) < 2:
+                continue
+            pyr = [t]
+            while len(pyr) <= levels and min(pyr[-1].shape) // 2 >= min_size:
+                pyr.append(cv2.pyrDown(pyr[-1]))
+            self.pyramids[s] = pyr
+
+    @staticmethod
+    def build_pyramid(gray, levels):
+        pyr = [gray]
+        for _ in range(levels):
+            if min(pyr[-1].shape) < 2:
+                break
+            pyr.append(cv2.pyrDown(pyr[-1]))
+        return pyr
+
+    @staticmethod
+    def _peaks(res, threshold, max_peaks):
+        dil = cv2.dilate(res, np.ones((3, 3), np.uint8))
+        ys, xs = np.nonzero((res >= dil) & (res >= threshold))
+        if ys.size == 0:
+            return []
+        scores = res[ys, xs]
+        order = np.argsort(-scores)[:max_peaks]
+        return [(int(xs[i]), int(ys[i]), float(scores[i])) for i in order]
+
+    def _refine(self, gray, tmpl, x, y, radius):
+        th, tw = tmpl.shape
+        H, W = gray.shape
+        x0, y0 = max(0, x - radius), max(0, y - radius)
+        x1, y1 = min(W - tw, x + radius), min(H - th, y + radius)
+        if x1 < x0 or y1 < y0:
+            return None
+        roi = gray[y0:y1 + th, x0:x1 + tw]
+        res = cv2.matchTemplate(roi, tmpl, cv2.TM_CCOEFF_NORMED)
+        _, score, _, loc = cv2.minMaxLoc(res)
+        return x0 + loc[0], y0 + loc[1], score
+
+    def match(self, gray, pyramid=None, region=None):
+        """Retorna até `top_k` detecções acima do limiar em `gray`.
+
+        `region` (x, y, w, h) restringe a busca a uma janela do quadro.
+        """
+        ox = oy = 0
+        if region is not None:
+            rx, ry, rw, rh = region
+            gray = gray[ry:ry + rh, rx:rx + rw]
+            ox, oy = rx, ry
+            pyramid = None
+        if pyramid is None:
+            pyramid = self.build_pyramid(gray, self.levels)
+
+        candidates = []
+        for s, tpyr in self.pyramids.items():
+            th, tw = tpyr[0].shape
+            if th > gray.shape[0] or tw > gray.shape[1]:
+                continue
+            level = min(len(tpyr), len(pyramid)) - 1
+            while level > 0 and (tpyr[level].shape[0] > pyramid[level].shape[0]
+                                 or tpyr[level].shape[1] > pyramid[level].shape[1]):
+                level -= 1
+            res = cv2.matchTemplate(pyramid[level], tpyr[level], cv2.TM_CCOEFF_NORMED)
+            if level == 0:
+                for x, y, score in self._peaks(res, self.threshold, self.top_k * 4):
+                    candidates.append((x + ox, y + oy, tw, th, score, s))
+                continue
+            factor = 1 << level
+            coarse_thr = self.threshold - self.coarse_slack
+            for cx, cy, _ in self._peaks(res, coarse_thr, self.top_k * 4):
+                hit = self._refine(gray, tpyr[0], cx * factor, cy * factor, factor + 2)
+                if hit is not None and hit[2] >= self.threshold:
+                    candidates.append((hit[0] + ox, hit[1] + oy, tw, th, hit[2], s))
+
+        return self.nms(candidates, self.nms_iou)[:self.top_k]
+
+    @staticmethod
+    def nms(detections, max_iou):
+        kept = []
+        for det in sorted(detections, key=lambda d: -d[4]):
+            if all(bbox_iou(det, k) <= max_iou for k in kept):
+                kept.append(det)
+        return kept
+
+
+class TemporalTemplateSearch:
+    """Busca temporal: procura perto da última detecção antes do quadro todo.
+
+    Enquanto houver uma detecção recente, o matcher roda só numa janela
+    expandida (`expand` vezes o tamanho do template) em volta dela. A busca
+    completa (pirâmide no quadro inteiro) só volta depois de `max_misses`
+    falhas seguidas na janela. `counters` registra quantas vezes cada
+    caminho foi usado.
+    """
+
+    def __init__(self, matcher, expand=2.0, max_misses=5):
+        self.matcher = matcher
+        self.expand = expand
+        self.max_misses = max_misses
+        self.last = None
+        self.misses = 0
+        self.counters = {"roi": 0, "full": 0, "roi_hits": 0, "full_hits": 0, "skipped": 0}
+
+    def reset(self):
+        self.last = None
+        self.misses = 0
+
+    def window(self, shape):
+        x, y, w, h = self.last[:4]
+        H, W = shape[:2]
+        mx = int(w * (self.expand - 1) / 2) + 1
+        my = int(h * (self.expand - 1) / 2) + 1
+        x0, y0 = max(0, x - mx), max(0, y - my)
+        x1, y1 = min(W, x + w + mx), min(H, y + h + my)
+        return x0, y0, x1 - x0, y1 - y0
+
+    def search(self, gray, pyramid=None):
+        if self.last is not None:
+            self.counters["roi"] += 1
+            matches = self.matcher.match(gray, region=self.window(gray.shape))
+            if matches:
+                self.counters["roi_hits"] += 1
+                self.last = matches[0]
+                self.misses = 0
+                return matches
+            self.misses += 1
+            if self.misses < self.max_misses:
+                self.counters["skipped"] += 1
+                return []
+            self.reset()
+
+        self.counters["full"] += 1
+        matches = self.matcher.match(gray, pyramid)
+        if matches:
+            self.counters["full_hits"] += 1
+            self.last = matches[0]
+            self.misses = 0
+        return matches
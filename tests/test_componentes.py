@@ -0,0 +1,59 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from componentes import ConnectedComponents  # noqa: E402
+
+
+def random_images():
+    rng = np.random.default_rng(0)
+    for density in (0.2, 0.45, 0.6):
+        for shape in ((1, 1), (1, 17), (17, 1), (23, 31), (40, 40)):
+            yield (rng.random(shape) < density).astype(np.uint8) * 255
+
+
+def synthetic_images():
+    yield np.zeros((16, 16), np.uint8)
+    yield np.full((16, 16), 255, np.uint8)
+    # Diagonal: um só objeto na vizinhança 8
+    yield (np.eye(20, dtype=np.uint8) * 255)
+    img = np.zeros((48, 64), np.uint8)
+    cv2.circle(img, (16, 16), 10, 255, -1)
+    cv2.rectangle(img, (30, 5), (60, 20), 255, -1)
+    cv2.rectangle(img, (36, 9), (54, 16), 0, -1)   # anel com furo
+    cv2.line(img, (2, 46), (62, 30), 255, 1)
+    # "U" que só se une na base: o rótulo vem da ordem de varredura
+    img[30:44, 10] = 255
+    img[30:44, 20] = 255
+    img[43, 10:21] = 255
+    yield img
+    # Objetos encostados na borda da imagem
+    img = np.zeros((12, 12), np.uint8)
+    img[0, :] = 255
+    img[:, -1] = 255
+    img[6:9, 0:2] = 255
+    yield img
+
+
+IMAGES = list(random_images()) + list(synthetic_images())
+
+
+@pytest.mark.parametrize("backend", ["opencv", "numpy", "auto"])
+@pytest.mark.parametrize("index", range(len(IMAGES)))
+def test_backend_matches_bfs(backend, index):
+    binary = IMAGES[index]
+    ref_count, ref_labels, ref_stats = ConnectedComponents("bfs").label(binary)
+    count, labels, stats = ConnectedComponents(backend).label(binary)
+
+    assert count == ref_count
+    # Mesma partição e mesma numeração (ordem de varredura)
+    assert np.array_equal(labels, ref_labels)
+    for field in ("label", "area", "x", "y", "w", "h"):
+        assert np.array_equal(stats[field], ref_stats[field]), field
+    assert np.allclose(stats["cx"], ref_stats["cx"])
+    assert np.allclose(stats["cy"], ref_stats["cy"])
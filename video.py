@@ -1,10 +1,15 @@
+import time
+
 import cv2
 import numpy as np
-import pygame
+from quadro import Frame
+from template import TemplateMatcher, TemporalTemplateSearch
+from geometria import bbox_iou
+from rastreamento import TrackManager, TrackerRegistry
 
 
 class VideoProcessor:
-    def __init__(self):
+    def __init__(self, audio=True):
         self.tracker = None             
         self.tracking = False           
         self.track_window = None        
@@ -12,32 +17,68 @@ class VideoProcessor:
         self.music_path = None          
         self.template = None            
         self.template_detected = False  
-        try:
-            pygame.mixer.init()
-        except Exception as e:
-            print("Aviso: pygame.mixer.init() falhou:", e)
-
-    def _create_tracker_instance(self):
-        creators = []
-        if hasattr(cv2, "TrackerCSRT_create"):
-            creators.append((lambda: cv2.TrackerCSRT_create(), "TrackerCSRT_create"))
-        if hasattr(cv2, "legacy") and hasattr(cv2.legacy, "TrackerCSRT_create"):
-            creators.append((lambda: cv2.legacy.TrackerCSRT_create(), "legacy.TrackerCSRT_create"))
-        if hasattr(cv2, "TrackerKCF_create"):
-            creators.append((lambda: cv2.TrackerKCF_create(), "TrackerKCF_create"))
-        if hasattr(cv2, "legacy") and hasattr(cv2.legacy, "TrackerKCF_create"):
-            creators.append((lambda: cv2.legacy.TrackerKCF_create(), "legacy.TrackerKCF_create"))
-
-        for cfunc, name in creators:
+        self.template_matcher = None
+        self.template_search = None
+        self.template_version = 0       # muda a cada load_template (entra em state_key)
+        self.template_max_misses = 5
+        self.template_scales = (1.0,)
+        self.template_levels = 2
+        self.template_top_k = 1
+        self.template_matches = []
+        # Detecta-e-rastreia: a detecção só roda sem rastreamento ativo ou
+        # a cada `redetect_interval` quadros para reverificar o tracker.
+        self.redetect_interval = 15
+        self.reacquire_iou = 0.3
+        self.frame_index = 0
+        self.last_detection_frame = None
+        self.timings = {"detection": 0.0, "tracking": 0.0}
+        self.multi_tracking = False
+        self.track_manager = None
+        self.tracker_registry = TrackerRegistry()
+        self.tracker_backend = None      # None = primeiro disponível (CSRT)
+        self.tracker_name = None
+        self.tracking_scale = 1.0        # < 1.0 rastreia em quadro reduzido
+        self.target_fps = 20.0
+        self.auto_switch_tracker = True
+        self.tracker_latency_ms = None
+        self._switch_frame = False
+        # pygame só é importado com áudio ligado (modo em lote roda sem ele)
+        self.pygame = None
+        if audio:
             try:
-                tr = cfunc()
-                if tr is not None:
-                    print(f"[VideoProcessor] Tracker criado: {name}")
-                    return tr, name
+                import pygame
+                pygame.mixer.init()
+                self.pygame = pygame
             except Exception as e:
-                print(f"[VideoProcessor] Falha ao criar {name}: {e}")
-                continue
-        return None, None
+                print("Aviso: pygame.mixer.init() falhou:", e)
+
+    def _create_tracker_instance(self):
+        tr, name = self.tracker_registry.create(self.tracker_backend, self.tracking_scale)
+        if tr is not None:
+            print(f"[VideoProcessor] Tracker criado: {name}")
+        return tr, name
+
+    def benchmark_trackers(self, frame, bbox):
+        """Mede os backends no quadro dado e escolhe o que atinge `target_fps`."""
+        results = self.tracker_registry.benchmark(frame, bbox, scale=self.tracking_scale)
+        self.tracker_backend = self.tracker_registry.select(self.target_fps)
+        print(f"[VideoProcessor] Benchmark de trackers: {results} -> {self.tracker_backend}")
+        return results
+
+    def _check_tracker_latency(self, latency_ms):
+        # Média móvel da latência; troca para um backend mais rápido se estourar
+        self.tracker_latency_ms = (latency_ms if self.tracker_latency_ms is None
+                                   else 0.8 * self.tracker_latency_ms + 0.2 * latency_ms)
+        if not self.auto_switch_tracker or self.track_window is None:
+            return
+        if self.tracker_latency_ms <= 1000.0 / self.target_fps:
+            return
+        faster = self.tracker_registry.faster_than(self.tracker_name)
+        if faster is None:
+            return
+        print(f"[VideoProcessor] {self.tracker_name} lento ({self.tracker_latency_ms:.1f} ms), trocando para {faster}")
+        self.tracker_backend = faster
+        self._switch_frame = True
 
     def init_tracker(self, frame, bbox):
         if frame is None:
@@ -71,7 +112,10 @@ class VideoProcessor:
                 raise Exception("Tracker.init() retornou False")
 
             self.tracker = tr
+            self.tracker_name = name
+            self.tracker_latency_ms = None
             self.tracking = True
+            self.track_window = (bx, by, bw, bh)
             print(f"[VideoProcessor] Tracker inicializado com sucesso ({name}) bbox={bx,by,bw,bh}")
             return True
 
@@ -82,43 +126,115 @@ class VideoProcessor:
             return False
 
     def update_tracker(self, frame):
+        f = Frame.wrap(frame)
         self.tracking = False 
+        self.frame_index += 1
+        start = time.perf_counter()
 
         if self.tracker is not None:
             try:
-                ok, bbox = self.tracker.update(frame)
+                ok, bbox = self.tracker.update(f.bgr)
             except Exception:
                 ok, bbox = False, None
+            self._check_tracker_latency((time.perf_counter() - start) * 1000)
 
             if ok and bbox is not None:
                 x, y, w, h = [int(v) for v in bbox]
-                if w > 5 and h > 5 and 0 <= x < frame.shape[1] and 0 <= y < frame.shape[0]:
-                    cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-                    cv2.putText(frame, "Rastreando", (x, max(0, y-10)),
+                if w > 5 and h > 5 and 0 <= x < f.shape[1] and 0 <= y < f.shape[0]:
+                    cv2.rectangle(f.canvas, (x, y), (x+w, y+h), (0, 255, 0), 2)
+                    cv2.putText(f.canvas, "Rastreando", (x, max(0, y-10)),
                                 cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
                     self.tracking = True
+                    self.track_window = (x, y, w, h)
                 else:
-                    cv2.putText(frame, "Perdeu o objeto", (20, 40),
+                    cv2.putText(f.canvas, "Perdeu o objeto", (20, 40),
                                 cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
                     self.tracker = None
+                    self.track_window = None
             else:
-                cv2.putText(frame, "Falha no rastreamento", (20, 40),
+                cv2.putText(f.canvas, "Falha no rastreamento", (20, 40),
                             cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
 
+        self.timings["tracking"] = time.perf_counter() - start
+        if self._switch_frame:
+            self._switch_frame = False
+            if self.tracking:
+                self.init_tracker(f.bgr, self.track_window)
         self._update_music_state()
-        return frame
+        return self._result(frame, f)
 
     def detect_purple_bottle(self, frame):
-        
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        f = Frame.wrap(frame)
+        if self.multi_tracking:
+            self._track_multiple(f)
+            return self._result(frame, f)
+        self.timings["detection"] = 0.0
+        due = (self.last_detection_frame is None
+               or self.frame_index - self.last_detection_frame >= self.redetect_interval)
+        if self.tracking and self.tracker is not None and not due:
+            return self._result(frame, f)
+
+        start = time.perf_counter()
+        self.last_detection_frame = self.frame_index
+        bbox = self._find_purple_bottle(f)
+        if bbox is not None:
+            if not self.tracking or self.tracker is None:
+                self.init_tracker(f.bgr, bbox)
+            elif self.track_window is None or bbox_iou(bbox, self.track_window) < self.reacquire_iou:
+                # Detecção discorda do tracker: readquire na posição detectada
+                self.init_tracker(f.bgr, bbox)
+        self.timings["detection"] = time.perf_counter() - start
+        return self._result(frame, f)
+
+    def _manager(self):
+        if self.track_manager is None:
+            self.track_manager = TrackManager(lambda: self._create_tracker_instance()[0])
+        return self.track_manager
+
+    def add_target(self, frame, bbox):
+        """Alvo escolhido pelo usuário no modo múltiplo: fica sempre em taxa cheia."""
+        track = self._manager().add(frame, bbox, priority=TrackManager.USER_PRIORITY)
+        self.tracking = self.tracking or track is not None
+        return track is not None
+
+    def close_tracks(self):
+        """Descarta os tracks e encerra a ThreadPool do rastreamento múltiplo."""
+        if self.track_manager is not None:
+            self.track_manager.close()
+            self.track_manager = None
+
+    def _track_multiple(self, f):
+        manager = self._manager()
+
+        detections = None
+        self.timings["detection"] = 0.0
+        if (not manager.tracks or self.last_detection_frame is None
+                or manager.frame_index + 1 - self.last_detection_frame >= self.redetect_interval):
+            start = time.perf_counter()
+            detections = self._find_purple_bottles(f)
+            self.last_detection_frame = manager.frame_index + 1
+            self.timings["detection"] = time.perf_counter() - start
+
+        tracks = manager.update(f.bgr, detections)
+        self.timings["tracking"] = manager.last_update_ms / 1000.0
+        for t in tracks:
+            x, y, w, h = t.bbox
+            cv2.rectangle(f.canvas, (x, y), (x + w, y + h), (0, 255, 0), 2)
+            cv2.putText(f.canvas, f"ID {t.id}", (x, max(0, y - 10)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+        self.tracking = self.tracking or bool(tracks)
+        self._update_music_state()
+
+    def _find_purple_bottles(self, f):
         lower = np.array([125, 50, 50])
         upper = np.array([155, 255, 255])
-        mask = cv2.inRange(hsv, lower, upper)
+        mask = cv2.inRange(f.hsv, lower, upper)
 
         kernel = np.ones((5, 5), np.uint8)
         mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
         mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
 
+        found = []
         contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         for c in contours:
             area = cv2.contourArea(c)
@@ -127,17 +243,46 @@ class VideoProcessor:
             x, y, w, h = cv2.boundingRect(c)
             aspect_ratio = max(w, h) / float(min(w, h) + 1)
             if 1.5 < aspect_ratio < 4.5:
-                if x > 20 and y > 20 and x + w < frame.shape[1] - 20 and y + h < frame.shape[0] - 20:
-                    self.init_tracker(frame, (x, y, w, h))
-                    break
-        return frame
+                if x > 20 and y > 20 and x + w < f.shape[1] - 20 and y + h < f.shape[0] - 20:
+                    found.append((x, y, w, h))
+        return found
+
+    def _find_purple_bottle(self, f):
+        found = self._find_purple_bottles(f)
+        return found[0] if found else None
+
+    @staticmethod
+    def _result(frame, f):
+        # Mantém a API antiga: ndarray entra, ndarray (anotado) sai
+        return frame if isinstance(frame, Frame) else f.output_bgr()
+
+    def state_key(self):
+        """Resumo do estado que influencia o resultado de um quadro.
+
+        Se ele não muda ao processar um quadro, reprocessar o mesmo quadro
+        dá o mesmo resultado (usado pelo cache de imagens estáticas).
+        """
+        tracks = ()
+        if self.multi_tracking and self.track_manager is not None:
+            tracks = tuple(sorted((t.id, t.bbox) for t in self.track_manager.tracks.values()))
+        return (self.tracking, self.track_window, self.template_version,
+                self.multi_tracking, tracks, self.tracker_backend, self.tracking_scale)
 
     def load_template(self, path):
+        # id() do matcher pode ser reaproveitado: a versão garante chave nova
+        self.template_version += 1
         try:
             self.template = cv2.imread(path)
+            self.template_matcher = None
+            self.template_search = None
             if self.template is None:
                 print("Erro: template não encontrado ou inválido.")
             else:
+                self.template_matcher = TemplateMatcher(
+                    self.template, scales=self.template_scales,
+                    levels=self.template_levels, top_k=self.template_top_k)
+                self.template_search = TemporalTemplateSearch(
+                    self.template_matcher, max_misses=self.template_max_misses)
                 print("Template carregado com sucesso.")
         except Exception as e:
             print("Erro ao carregar template:", e)
@@ -145,35 +290,37 @@ class VideoProcessor:
     def detect_template(self, frame, match_threshold=0.8):
         
         self.template_detected = False
+        self.template_matches = []
 
-        if self.template is None:
+        if self.template_matcher is None:
             self._update_music_state()
             return frame
 
+        f = Frame.wrap(frame)
         try:
-            gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            gray_template = cv2.cvtColor(self.template, cv2.COLOR_BGR2GRAY)
-            h, w = gray_template.shape
-            result = cv2.matchTemplate(gray_frame, gray_template, cv2.TM_CCOEFF_NORMED)
-            loc = np.where(result >= match_threshold)
-
-            for pt in zip(*loc[::-1]):
-                cv2.rectangle(frame, pt, (pt[0] + w, pt[1] + h), (0, 255, 0), 2)
-                cv2.putText(frame, "Template detectado", (pt[0], pt[1] - 10),
+            matcher = self.template_matcher
+            matcher.threshold = match_threshold
+            self.template_matches = self.template_search.search(f.gray, f.pyramid(matcher.levels))
+
+            for x, y, w, h, score, _ in self.template_matches:
+                cv2.rectangle(f.canvas, (x, y), (x + w, y + h), (0, 255, 0), 2)
+                cv2.putText(f.canvas, f"Template detectado ({score:.2f})", (x, y - 10),
                             cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-                self.template_detected = True
-                break
+            self.template_detected = bool(self.template_matches)
 
         except Exception as e:
             print("Erro em detect_template:", e)
 
         self._update_music_state()
-        return frame
+        return self._result(frame, f)
 
     def set_music(self, path):
         """Carrega o arquivo de música para tocar durante detecções."""
+        if self.pygame is None:
+            print("Aviso: áudio indisponível, música não carregada.")
+            return
         try:
-            pygame.mixer.music.load(path)
+            self.pygame.mixer.music.load(path)
             self.music_loaded = True
             self.music_path = path
             print("Música carregada com sucesso.")
@@ -185,9 +332,10 @@ class VideoProcessor:
         if not self.music_loaded:
             return
         try:
-            if active and not pygame.mixer.music.get_busy():
-                pygame.mixer.music.play(-1)
-            elif not active and pygame.mixer.music.get_busy():
-                pygame.mixer.music.stop()
+            music = self.pygame.mixer.music
+            if active and not music.get_busy():
+                music.play(-1)
+            elif not active and music.get_busy():
+                music.stop()
         except Exception as e:
             print("Erro ao atualizar música:", e)